@@ -6,22 +6,33 @@ the laptop to inbound SSH.
 
 Flow:
   1. SSH → Pi: run_pipeline.py (discover, fetch, cloud upload)  → result path
-  2. SCP ← Pi: pull the model file to local ~/3d-pipeline/models/
+  2. rsync ← Pi: pull the model file to local ~/3d-pipeline/models/
   3. Local: Blender Docker mesh decimation
   4. Local: OrcaSlicer slice + Bambu FTPS/MQTT print
   5. SSH → Pi: openclaw Telegram notification
 """
 import argparse
+import collections
+import fcntl
+import hashlib
 import json
 import os
 import signal
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import Future
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "pipeline"))
+from envutil import load_env  # noqa: E402
 PIDFILE = os.path.join(SCRIPT_DIR, ".orchestrate.pid")
+SINGLETON_TIMEOUT = 2  # seconds to wait after each SIGTERM/SIGKILL
+_PIDFILE_FD = None
 VERBOSE = False
+TAIL_LINES = 200  # child output lines kept for error reports
+STEP_TIMINGS = []  # (step name, seconds, ok) for the end-of-run summary line
 
 # Defaults — overridden by .env
 PI_HOST = "192.168.1.134"
@@ -30,107 +41,322 @@ PI_PIPELINE_DIR = "/home/sanchobot/3d-printline/pipeline"
 LAPTOP_PIPELINE_DIR = os.path.expanduser("~/3d-pipeline")
 OPENCLAW_BIN = "/home/sanchobot/.npm-global/bin/openclaw"
 TELEGRAM_TARGET = ""
+_OPENCLAW_OK = True  # cleared once the Pi reports openclaw missing (exit 127)
+
+# One multiplexed SSH connection is shared by every ssh/scp/rsync call to the
+# Pi. %C (hash of user, host and port) keeps the socket path under the
+# 104-byte AF_UNIX limit however long the host name is.
+SSH_CONTROL_PATH = "~/.ssh/cm-3dpl-%C"
+SSH_CONTROL_PERSIST = 600
 
 
 # ── helpers ──────────────────────────────────────────────────────────
 
+_OUT_LOCK = threading.Lock()
+
+
+def emit(msg):
+    """print() that can't land mid-line in step_pi_worker's byte relay."""
+    with _OUT_LOCK:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(f"{msg}\n".encode())
+        sys.stdout.buffer.flush()
+
+
 def vlog(msg):
     if VERBOSE:
-        print(f"  [verbose] {msg}")
+        emit(f"  [verbose] {msg}")
 
 
-def load_env(env_path):
-    config = {}
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    return config
+def _try_flock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
 
 
 def enforce_singleton():
-    my_pid = os.getpid()
-    my_ppid = os.getppid()
-    safe_pids = {my_pid, my_ppid}
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", "python3.*orchestrate\\.py"],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.stdout.strip():
-            for line in result.stdout.strip().split("\n"):
-                pid = int(line.strip())
-                if pid not in safe_pids:
-                    print(f"Killing previous orchestrator PID {pid}...")
+    """Hold an exclusive flock on PIDFILE, terminating any previous holder.
+
+    The holder gets one SIGTERM, then one SIGKILL, each followed by up to
+    SINGLETON_TIMEOUT seconds of waiting for the lock.
+    """
+    global _PIDFILE_FD
+    fd = os.open(PIDFILE, os.O_CREAT | os.O_RDWR, 0o644)
+    acquired = _try_flock(fd)
+    for sig, action in ((signal.SIGTERM, "Terminating"), (signal.SIGKILL, "Killing")):
+        if acquired:
+            break
+        deadline = time.monotonic() + SINGLETON_TIMEOUT
+        signalled = False
+        while not acquired and time.monotonic() < deadline:
+            if not signalled:
+                # The holder may not have written its PID yet; retry next tick
+                try:
+                    old_pid = int(os.pread(fd, 32, 0).strip() or 0)
+                except ValueError:
+                    old_pid = 0
+                if old_pid and old_pid != os.getpid():
+                    print(f"{action} previous orchestrator PID {old_pid}...")
                     try:
-                        os.kill(pid, signal.SIGKILL)
+                        os.kill(old_pid, sig)
                     except (ProcessLookupError, PermissionError):
                         pass
-            time.sleep(0.5)
-    except (subprocess.TimeoutExpired, FileNotFoundError, ValueError):
-        pass
-    with open(PIDFILE, "w") as f:
-        f.write(str(my_pid))
+                    signalled = True
+            time.sleep(0.02)
+            acquired = _try_flock(fd)
+    if not acquired:
+        os.close(fd)
+        raise RuntimeError(f"Could not acquire {PIDFILE}")
+    os.ftruncate(fd, 0)
+    os.pwrite(fd, str(os.getpid()).encode(), 0)
+    # Keep fd open for the process lifetime — closing it releases the lock
+    _PIDFILE_FD = fd
 
 
 def cleanup_pidfile():
+    # Truncate rather than unlink: a waiter may already hold an fd on this
+    # inode, and unlinking would let a third process lock a fresh file.
+    global _PIDFILE_FD
+    if _PIDFILE_FD is None:
+        return
     try:
-        if os.path.exists(PIDFILE):
-            with open(PIDFILE) as f:
-                if f.read().strip() == str(os.getpid()):
-                    os.remove(PIDFILE)
+        os.ftruncate(_PIDFILE_FD, 0)
+        os.close(_PIDFILE_FD)
     except OSError:
         pass
+    _PIDFILE_FD = None
+
+
+def _ssh_base_argv(prog="ssh"):
+    """ssh/scp argv prefix that reuses the ControlMaster socket to the Pi."""
+    return [prog,
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={SSH_CONTROL_PATH}",
+            "-o", f"ControlPersist={SSH_CONTROL_PERSIST}"]
+
+
+def open_ssh_master():
+    """Prewarm the ControlMaster socket so later ssh/scp calls skip auth."""
+    try:
+        r = subprocess.run(_ssh_base_argv() + ["-MNf", f"{PI_USER}@{PI_HOST}"],
+                           capture_output=True, text=True, timeout=30)
+        vlog(f"ssh master rc={r.returncode}")
+        if r.returncode != 0:
+            vlog(f"ssh master stderr: {r.stderr[:200]}")
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        vlog(f"ssh master error: {e}")
+
+
+def close_ssh_master():
+    """Tear down the ControlMaster socket opened by open_ssh_master()."""
+    try:
+        subprocess.run(["ssh", "-o", f"ControlPath={SSH_CONTROL_PATH}",
+                        "-O", "exit", f"{PI_USER}@{PI_HOST}"],
+                       capture_output=True, timeout=10)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        pass
 
 
 def ssh_pi(cmd, timeout=60, check=True):
     """Run a command on the Pi via SSH."""
-    full = ["ssh", f"{PI_USER}@{PI_HOST}", cmd]
+    full = _ssh_base_argv() + [f"{PI_USER}@{PI_HOST}", cmd]
     vlog(f"ssh → {cmd[:120]}")
     return subprocess.run(full, capture_output=True, text=True, timeout=timeout, check=check)
 
 
 def notify(message, is_error=False):
     """Send Telegram notification via Pi's OpenClaw."""
+    global _OPENCLAW_OK
     prefix = "❌" if is_error else "ℹ️"
     full_msg = f"{prefix} 3d-printline: {message}"
     print(full_msg)
     if not TELEGRAM_TARGET:
         vlog("notify skipped: TELEGRAM_TARGET not set")
         return
+    if not _OPENCLAW_OK:
+        return
     try:
         cmd = (f"{OPENCLAW_BIN} message send --channel telegram "
                f"--target {TELEGRAM_TARGET} --message '{full_msg}'")
         r = ssh_pi(cmd, timeout=30, check=False)
         vlog(f"notify rc={r.returncode}")
+        if r.returncode == 127:
+            _OPENCLAW_OK = False
+            vlog("notify disabled: openclaw not found on Pi")
         if r.returncode != 0:
             vlog(f"notify stderr: {r.stderr[:200]}")
     except (subprocess.TimeoutExpired, FileNotFoundError) as e:
         vlog(f"notify error: {e}")
 
 
+def stream_subprocess(cmd, keywords, timeout):
+    """Run cmd with stdout+stderr streamed line by line.
+
+    Echoes every line under -v, otherwise only lines containing one of
+    `keywords`. Only the last TAIL_LINES lines are kept, so memory stays
+    bounded however chatty the child is. Returns (returncode, tail).
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, bufsize=1)
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        proc.kill()
+
+    killer = threading.Timer(timeout, _kill)
+    killer.start()
+    tail = collections.deque(maxlen=TAIL_LINES)
+    try:
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            tail.append(line)
+            if VERBOSE or any(k in line for k in keywords):
+                print(f"  {line}")
+        proc.wait()
+    finally:
+        killer.cancel()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return proc.returncode, tail
+
+
 def run_step(step_name, func, *args, **kwargs):
     print(f"\n{'='*60}")
     print(f"STEP: {step_name}")
     print(f"{'='*60}")
-    start = time.time()
+    start = time.monotonic()
     try:
         result = func(*args, **kwargs)
-        elapsed = time.time() - start
+        elapsed = time.monotonic() - start
+        STEP_TIMINGS.append((step_name, elapsed, True))
         print(f"✓ {step_name} completed in {elapsed:.0f}s")
         return result
     except Exception as e:
-        elapsed = time.time() - start
+        elapsed = time.monotonic() - start
+        STEP_TIMINGS.append((step_name, elapsed, False))
         error_msg = f"{step_name} failed after {elapsed:.0f}s: {e}"
         print(f"✗ {error_msg}", file=sys.stderr)
         notify(error_msg, is_error=True)
         raise
 
 
+def log_step_timings():
+    """Print per-step timings as one JSON line for offline analysis."""
+    steps = [{"step": name, "seconds": round(secs, 3), "ok": ok}
+             for name, secs, ok in STEP_TIMINGS]
+    print("STEP_TIMINGS=" + json.dumps(steps), flush=True)
+
+
+BLENDER_IMAGE = "nytimes/blender:latest"
+BLENDER_DAEMON_NAME = "blender-daemon"
+
+# remote result path -> prefetch state {"future", "procs", "cancelled"} for
+# the _pull_from_pi started as soon as the Pi worker reports RESULT_PATH
+_PULL_PREFETCH = {}
+
+
+def _start_prefetch(config, result_path):
+    """Run _pull_from_pi on a daemon thread, so it never holds up exit."""
+    prefetch = {"future": Future(), "procs": [], "cancelled": False}
+
+    def run():
+        try:
+            prefetch["future"].set_result(_pull_from_pi(config, result_path, prefetch))
+        except BaseException as e:
+            prefetch["future"].set_exception(e)
+
+    _PULL_PREFETCH[result_path] = prefetch
+    threading.Thread(target=run, name="pull-prefetch", daemon=True).start()
+
+
+def _cancel_prefetch(result_path):
+    """Abandon a prefetch: no new transfers start and running ones are killed."""
+    prefetch = _PULL_PREFETCH.pop(result_path, None)
+    if prefetch is None:
+        return
+    prefetch["cancelled"] = True
+    for proc in list(prefetch["procs"]):
+        if proc.poll() is None:
+            proc.kill()
+    vlog("Cancelled model prefetch")
+
+
+def _track(proc, prefetch):
+    """Register proc with a prefetch (if any) so cancelling can kill it."""
+    if prefetch is not None:
+        prefetch["procs"].append(proc)
+        if prefetch["cancelled"]:
+            proc.kill()
+    return proc
+
+
+def _run_tracked(argv, prefetch, timeout):
+    """subprocess.run(capture_output=True, text=True) with the child tracked."""
+    if prefetch is not None and prefetch["cancelled"]:
+        raise RuntimeError("Model prefetch cancelled")
+    proc = _track(subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True), prefetch)
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    if prefetch is not None and prefetch["cancelled"]:
+        raise RuntimeError("Model prefetch cancelled")
+    return subprocess.CompletedProcess(argv, proc.returncode, out, err)
+
+
+def prewarm_blender_image():
+    """Pull the Blender image in the background while the Pi worker runs.
+
+    Returns the thread so the caller can join it before decimation.
+    """
+    def _pull():
+        try:
+            r = subprocess.run(["docker", "image", "inspect", BLENDER_IMAGE],
+                               capture_output=True, timeout=30)
+            if r.returncode != 0:
+                vlog(f"Pulling {BLENDER_IMAGE} in background...")
+                subprocess.run(["docker", "pull", BLENDER_IMAGE],
+                               capture_output=True, timeout=1800)
+            vlog(f"{BLENDER_IMAGE} ready")
+        except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+            vlog(f"docker prewarm error: {e}")
+
+    t = threading.Thread(target=_pull, daemon=True)
+    t.start()
+    return t
+
+
+def ensure_blender_daemon():
+    """Start the long-lived Blender container unless it is already up.
+
+    The container is deliberately left running after the pipeline exits so
+    later runs skip container + Blender cold start; remove it with
+    `docker rm -f blender-daemon`. It is recreated if LAPTOP_PIPELINE_DIR
+    no longer matches its /data mount.
+    """
+    r = subprocess.run(
+        ["docker", "inspect", "-f",
+         '{{.State.Running}} {{range .Mounts}}{{if eq .Destination "/data"}}{{.Source}}{{end}}{{end}}',
+         BLENDER_DAEMON_NAME],
+        capture_output=True, text=True, timeout=30)
+    if r.returncode == 0 and r.stdout.split() == ["true", LAPTOP_PIPELINE_DIR]:
+        vlog(f"{BLENDER_DAEMON_NAME} already running")
+        return
+    subprocess.run(["docker", "rm", "-f", BLENDER_DAEMON_NAME],
+                   capture_output=True, timeout=60)
+    print(f"Starting {BLENDER_DAEMON_NAME} container...")
+    subprocess.run(["docker", "run", "-d", "--name", BLENDER_DAEMON_NAME,
+                    "-v", f"{LAPTOP_PIPELINE_DIR}:/data", BLENDER_IMAGE,
+                    "tail", "-f", "/dev/null"],
+                   capture_output=True, timeout=300, check=True)
+
+
 # ── steps ────────────────────────────────────────────────────────────
 
 def step_pi_worker(config, project_name):
@@ -139,38 +365,113 @@ def step_pi_worker(config, project_name):
     verbose_flag = "-v" if VERBOSE else ""
     project_flag = f"--project '{project_name}'" if project_name else ""
 
-    cmd = (f"cd {PI_PIPELINE_DIR} && PYTHONUNBUFFERED=1 python3 run_pipeline.py "
+    cmd = (f"cd {PI_PIPELINE_DIR} && PYTHONUNBUFFERED=1 stdbuf -oL python3 run_pipeline.py "
            f"--config {pi_env} {verbose_flag} {project_flag}")
 
     vlog(f"Pi worker cmd: {cmd}")
     print("Running Pi-side worker (discover → fetch → cloud upload)...")
 
-    # Stream output live
+    # Stream output live, line by line, as raw bytes — lines are relayed to
+    # our stdout without decoding; only RESULT_PATH is ever decoded.
     proc = subprocess.Popen(
-        ["ssh", f"{PI_USER}@{PI_HOST}", cmd],
-        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        text=True
+        _ssh_base_argv() + [f"{PI_USER}@{PI_HOST}", cmd],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT
     )
 
+    sys.stdout.flush()
+    out = sys.stdout.buffer
     result_path = None
-    for line in proc.stdout:
-        line = line.rstrip()
-        print(f"  [pi] {line}")
-        if line.startswith("RESULT_PATH="):
-            result_path = line.split("=", 1)[1]
-
-    proc.wait()
-    if proc.returncode != 0:
-        raise RuntimeError(f"Pi worker exited with code {proc.returncode}")
-    if not result_path:
-        raise RuntimeError("Pi worker did not output RESULT_PATH")
+    try:
+        for line in iter(proc.stdout.readline, b""):
+            with _OUT_LOCK:
+                out.write(b"  [pi] ")
+                out.write(line if line.endswith(b"\n") else line + b"\n")
+                out.flush()
+            if line.startswith(b"RESULT_PATH="):
+                result_path = line[len(b"RESULT_PATH="):].rstrip().decode()
+                # Start pulling while the remote worker shuts down
+                _start_prefetch(config, result_path)
+
+        proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"Pi worker exited with code {proc.returncode}")
+        if not result_path:
+            raise RuntimeError("Pi worker did not output RESULT_PATH")
+    except BaseException:
+        if result_path:
+            _cancel_prefetch(result_path)
+        raise
 
     vlog(f"Remote result: {result_path}")
     return result_path
 
 
+def _pull_gzip_stream(remote_result_path, local_path, prefetch=None):
+    """Fallback transfer: stream `gzip -c` over SSH and decompress locally."""
+    import gzip
+    import shlex
+    import shutil
+
+    if prefetch is not None and prefetch["cancelled"]:
+        raise RuntimeError("Model prefetch cancelled")
+    cmd = f"gzip -c {shlex.quote(remote_result_path)}"
+    proc = _track(subprocess.Popen(_ssh_base_argv() + [f"{PI_USER}@{PI_HOST}", cmd],
+                                   stdout=subprocess.PIPE), prefetch)
+    with gzip.GzipFile(fileobj=proc.stdout) as src, open(local_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    proc.wait(timeout=300)
+    if proc.returncode != 0:
+        raise RuntimeError(f"gzip-over-ssh pull failed: exit code {proc.returncode}")
+
+
 def step_pull_from_pi(config, remote_result_path):
-    """SCP the model file from Pi to local laptop. Extracts zip if needed."""
+    """Pull the model file from Pi to local laptop. Extracts zip if needed.
+
+    Waits on the prefetch started by step_pi_worker when there is one.
+    """
+    prefetch = _PULL_PREFETCH.pop(remote_result_path, None)
+    if prefetch is not None:
+        vlog("Waiting for pull prefetched during Pi worker...")
+        return prefetch["future"].result()
+    return _pull_from_pi(config, remote_result_path)
+
+
+def sha256_file(path):
+    """Hex SHA-256 of a file's contents."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def _local_copy_matches(local_path, remote_result_path, prefetch=None):
+    """True if local_path already holds the same bytes as the file on the Pi."""
+    import shlex
+
+    if not os.path.isfile(local_path):
+        return False
+    q = shlex.quote(remote_result_path)
+    cmd = f"stat -c %s {q} 2>/dev/null; sha256sum {q} 2>/dev/null"
+    vlog(f"ssh → {cmd[:120]}")
+    r = _run_tracked(_ssh_base_argv() + [f"{PI_USER}@{PI_HOST}", cmd], prefetch, timeout=120)
+    fields = r.stdout.split()
+    if len(fields) < 2 or not fields[0].isdigit():
+        return False
+    if int(fields[0]) != os.path.getsize(local_path):
+        return False
+    return fields[1] == sha256_file(local_path)
+
+
+def _pull_from_pi(config, remote_result_path, prefetch=None):
+    """Pull the model file from Pi to local laptop. Extracts zip if needed.
+
+    Uses compressed, resumable rsync over the shared SSH connection; falls
+    back to a gzip stream over SSH when rsync is missing on either side.
+    prefetch, when running as one, tracks the child processes for cancelling.
+    """
     import zipfile
 
     local_models = os.path.join(LAPTOP_PIPELINE_DIR, "models")
@@ -180,24 +481,39 @@ def step_pull_from_pi(config, remote_result_path):
     local_path = os.path.join(local_models, filename)
     remote = f"{PI_USER}@{PI_HOST}:{remote_result_path}"
 
-    print(f"SCP: {remote} → {local_path}")
-    subprocess.run(
-        ["scp", remote, local_path],
-        timeout=300, check=True
-    )
-    size_mb = os.path.getsize(local_path) / 1e6
-    vlog(f"Downloaded {size_mb:.1f} MB")
+    if _local_copy_matches(local_path, remote_result_path, prefetch):
+        emit(f"Already have {local_path}, skipping transfer")
+    else:
+        emit(f"rsync: {remote} → {local_path}")
+        # Level 3 gets most of zlib's gain on mesh data for far less Pi CPU
+        rsync_cmd = ["rsync", "-az", "--compress-level=3", "--partial", "--inplace",
+                     "-e", " ".join(_ssh_base_argv()), remote, local_path]
+        try:
+            r = _run_tracked(rsync_cmd, prefetch, timeout=300)
+            rsync_ok = r.returncode == 0
+            if not rsync_ok:
+                vlog(f"rsync rc={r.returncode}: {r.stderr[:200]}")
+        except FileNotFoundError:
+            vlog("rsync not installed locally")
+            rsync_ok = False
+        if not rsync_ok:
+            if prefetch is not None and prefetch["cancelled"]:
+                raise RuntimeError("Model prefetch cancelled")
+            emit("rsync unavailable, falling back to gzip over SSH...")
+            _pull_gzip_stream(remote_result_path, local_path, prefetch)
+        size_mb = os.path.getsize(local_path) / 1e6
+        vlog(f"Downloaded {size_mb:.1f} MB")
 
     # If it's a zip, extract and find the OBJ/GLB model inside
     if filename.endswith(".zip") and zipfile.is_zipfile(local_path):
-        print("Extracting zip...")
+        emit("Extracting zip...")
         with zipfile.ZipFile(local_path, 'r') as zf:
             zf.extractall(local_models)
             model_exts = ('.obj', '.glb', '.stl', '.ply')
             for name in zf.namelist():
                 if name.lower().endswith(model_exts):
                     extracted = os.path.join(local_models, name)
-                    print(f"Extracted model: {name}")
+                    emit(f"Extracted model: {name}")
                     return extracted
         raise RuntimeError(f"No model file found in {filename}")
 
@@ -211,10 +527,15 @@ def step_decimate(config, model_path):
     name_base = os.path.splitext(filename)[0]
     output_stl = os.path.join(LAPTOP_PIPELINE_DIR, "models", f"{name_base}_decimated.stl")
 
-    docker_cmd = [
-        "docker", "run", "--rm",
-        "-v", f"{LAPTOP_PIPELINE_DIR}:/data",
-        "nytimes/blender:latest", "blender", "-b", "-noaudio",
+    if config.get("BLENDER_DAEMON", "0") == "1":
+        ensure_blender_daemon()
+        docker_prefix = ["docker", "exec", BLENDER_DAEMON_NAME]
+    else:
+        docker_prefix = ["docker", "run", "--rm",
+                         "-v", f"{LAPTOP_PIPELINE_DIR}:/data", BLENDER_IMAGE]
+
+    docker_cmd = docker_prefix + [
+        "blender", "-b", "-noaudio",
         "-P", "/data/scripts/decimate_and_export.py",
         "--", "--ratio", str(ratio),
         "--inm", f"/data/models/{filename}",
@@ -223,19 +544,12 @@ def step_decimate(config, model_path):
 
     vlog(f"Docker cmd: {' '.join(docker_cmd)}")
     print("Running Blender decimation locally...")
-    result = subprocess.run(docker_cmd, capture_output=True, text=True, timeout=600)
+    returncode, tail = stream_subprocess(
+        docker_cmd, ["Original", "Final", "Exported", "Done", "ratio"], timeout=600)
 
-    if VERBOSE:
-        print(result.stdout)
-        if result.stderr:
-            print(f"  [verbose] stderr: {result.stderr[:500]}")
-    else:
-        for line in result.stdout.split("\n"):
-            if any(k in line for k in ["Original", "Final", "Exported", "Done", "ratio"]):
-                print(f"  {line}")
-    if result.returncode != 0:
-        print(result.stderr, file=sys.stderr)
-        raise RuntimeError(f"Blender decimation failed: exit code {result.returncode}")
+    if returncode != 0:
+        print("\n".join(tail), file=sys.stderr)
+        raise RuntimeError(f"Blender decimation failed: exit code {returncode}")
 
     notify(f"Mesh decimated: {name_base} (ratio={ratio})")
     return output_stl
@@ -244,43 +558,33 @@ def step_decimate(config, model_path):
 def step_slice_and_print(config, stl_path):
     """Run OrcaSlicer + Bambu print locally."""
     scripts_dir = os.path.join(LAPTOP_PIPELINE_DIR, "scripts")
-    config_path = os.path.join(LAPTOP_PIPELINE_DIR, ".env")
-
-    # Write a local .env for slice_and_print.py
-    env_path = config["_env_path"]
-    if env_path != config_path:
-        subprocess.run(["cp", env_path, config_path], check=True)
 
+    # Point slice_and_print.py at the orchestrator's own .env — no copy needed
     cmd = [
         "python3", os.path.join(scripts_dir, "slice_and_print.py"),
         "--stl", stl_path,
-        "--config", config_path
+        "--config", os.path.abspath(config["_env_path"])
     ]
 
     vlog(f"Slice cmd: {' '.join(cmd)}")
     notify("Starting slice and print...")
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    returncode, tail = stream_subprocess(
+        cmd, ["Slic", "Upload", "MQTT", "Print", "PRINTER"], timeout=600)
 
-    if VERBOSE:
-        print(result.stdout)
-        if result.stderr:
-            print(f"  [verbose] stderr: {result.stderr[:500]}")
-    else:
-        for line in result.stdout.split("\n"):
-            if any(k in line for k in ["Slic", "Upload", "MQTT", "Print", "PRINTER"]):
-                print(f"  {line}")
-    if result.returncode != 0:
-        print(result.stderr, file=sys.stderr)
-        raise RuntimeError(f"Slice and print failed: exit code {result.returncode}")
+    if returncode != 0:
+        print("\n".join(tail), file=sys.stderr)
+        raise RuntimeError(f"Slice and print failed: exit code {returncode}")
 
-    for line in reversed(result.stdout.strip().split("\n")):
-        try:
-            print_result = json.loads(line)
-            remaining = print_result.get("remaining_minutes", "unknown")
-            notify(f"✅ Print started! ETA: {remaining} minutes")
-            return print_result
-        except (json.JSONDecodeError, ValueError):
-            continue
+    # slice_and_print.py ends with a single JSON status line
+    last_json_line = next((line for line in reversed(tail) if line.startswith("{")), None)
+    try:
+        print_result = json.loads(last_json_line) if last_json_line else None
+    except ValueError:
+        print_result = None
+    if isinstance(print_result, dict):
+        remaining = print_result.get("remaining_minutes", "unknown")
+        notify(f"✅ Print started! ETA: {remaining} minutes")
+        return print_result
 
     notify("Print command sent (could not parse status)")
     return {"status": "sent"}
@@ -297,6 +601,7 @@ def run(env_path, project_name=None, verbose=False):
     enforce_singleton()
     atexit.register(cleanup_pidfile)
     vlog(f"Singleton enforced, PID {os.getpid()}")
+    blender_prewarm = prewarm_blender_image()
 
     config = load_env(env_path)
     config["_env_path"] = env_path
@@ -315,7 +620,10 @@ def run(env_path, project_name=None, verbose=False):
     vlog(f"Laptop dir: {LAPTOP_PIPELINE_DIR}")
     vlog(f"Telegram target: {TELEGRAM_TARGET or '(not set)'}")
 
-    pipeline_start = time.time()
+    open_ssh_master()
+    atexit.register(close_ssh_master)
+
+    pipeline_start = time.monotonic()
     notify(f"Pipeline starting{f' for project: {project_name}' if project_name else ''}...")
 
     try:
@@ -328,6 +636,7 @@ def run(env_path, project_name=None, verbose=False):
                                step_pull_from_pi, config, remote_result)
 
         # Step 4: Blender decimation (local Docker)
+        blender_prewarm.join(timeout=600)
         local_stl = run_step("Blender Decimation",
                              step_decimate, config, local_model)
 
@@ -335,13 +644,15 @@ def run(env_path, project_name=None, verbose=False):
         print_result = run_step("Slice & Print",
                                 step_slice_and_print, config, local_stl)
 
-        elapsed = time.time() - pipeline_start
+        elapsed = time.monotonic() - pipeline_start
         notify(f"✅ Pipeline complete in {elapsed / 60:.1f} minutes!")
 
     except Exception as e:
-        elapsed = time.time() - pipeline_start
+        elapsed = time.monotonic() - pipeline_start
         notify(f"Pipeline failed after {elapsed / 60:.1f} minutes: {e}", is_error=True)
         sys.exit(1)
+    finally:
+        log_step_timings()
 
 
 if __name__ == "__main__":
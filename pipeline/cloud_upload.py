@@ -3,43 +3,59 @@
 Upload scan images to OpenScanCloud, poll for processing completion, and download the result.
 Based on the official OpenScanCloud uploader.py.
 """
+import hashlib
 import os
+import random
 import requests
+import shutil
 import sys
 import time
 import json
-from zipfile import ZipFile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
+
+from envutil import load_env
 
 
 MAX_PART_SIZE = 200_000_000  # 200MB
+MAX_UPLOAD_WORKERS = 4
+ZIP_READ_WORKERS = 4
+ZIP_READ_AHEAD = 8
+MIN_POLL_INTERVAL = 5
+POLL_BACKOFF = 1.5
+POLL_JITTER = 0.2  # ±20%, so many Pis don't poll in lockstep
+DOWNLOAD_ATTEMPTS = 3
+RESULT_CACHE_TTL = 7 * 24 * 3600  # 7 days
+CACHE_MODES = ("off", "readWrite", "readOnly")
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
 
 
-def load_env(env_path):
-    """Load .env file into a dict."""
-    config = {}
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    return config
-
-
 class OpenScanCloudClient:
     def __init__(self, server, token, user="openscan", password="free"):
         self.server = server.rstrip("/") + "/"
         self.token = token
         self.auth = (user, password)
+        # One keep-alive session for all control-plane calls and part uploads.
+        # Auth is passed per call so presigned upload links never see it.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                              max_retries=Retry(total=3, backoff_factor=0.3,
+                                                status_forcelist=[502, 503, 504]))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
 
     def _get(self, endpoint, params=None):
         if params is None:
             params = {}
         params["token"] = self.token
-        r = requests.get(self.server + endpoint, auth=self.auth, params=params, timeout=120)
+        r = self.session.get(self.server + endpoint, auth=self.auth, params=params, timeout=120)
         return r
 
     def get_token_info(self):
@@ -67,17 +83,17 @@ class OpenScanCloudClient:
 
     def upload_part(self, upload_link, filepath):
         print(f"  Uploading {os.path.basename(filepath)} ({os.path.getsize(filepath) / 1e6:.1f} MB)...")
+        # Pass the file object so requests streams it instead of holding the part in RAM
         with open(filepath, "rb") as f:
-            data = f.read()
-        r = requests.post(upload_link, data=data,
-                          headers={"Content-type": "application/octet-stream"}, timeout=300)
+            r = self.session.post(upload_link, data=f,
+                                  headers={"Content-type": "application/octet-stream"}, timeout=300)
         if r.status_code != 200:
             raise RuntimeError(f"Upload failed: HTTP {r.status_code}")
 
     def start_project(self, project_name):
         # startProject can be slow after large uploads
         params = {"token": self.token, "project": project_name}
-        r = requests.get(self.server + "startProject", auth=self.auth, params=params, timeout=300)
+        r = self.session.get(self.server + "startProject", auth=self.auth, params=params, timeout=300)
         if r.status_code != 200:
             raise RuntimeError(f"startProject failed: HTTP {r.status_code}")
         print("Processing started on OpenScanCloud")
@@ -92,30 +108,85 @@ class OpenScanCloudClient:
         try:
             r = self._get("getQueueEstimate")
             if r.status_code == 200:
-                return r.json()
+                data = r.json()
+                if isinstance(data, dict):  # callers read keys from it
+                    return data
         except Exception:
             pass
         return {}
 
 
 def collect_images(image_dir):
-    """Collect image files from directory."""
-    images = []
-    for f in sorted(os.listdir(image_dir)):
-        if os.path.splitext(f)[1].lower() in ALLOWED_EXTENSIONS:
-            images.append(os.path.join(image_dir, f))
+    """Collect image files from directory.
+
+    Returns a sorted list of (path, size) tuples from a single scandir pass.
+    """
+    with os.scandir(image_dir) as it:
+        images = [(e.path, e.stat(follow_symlinks=False).st_size) for e in it
+                  if e.is_file(follow_symlinks=False)
+                  and os.path.splitext(e.name)[1].lower() in ALLOWED_EXTENSIONS]
+    images.sort()
     return images
 
 
+IMAGE_KEY_HEAD_BYTES = 4096  # covers the JPEG EXIF block with the capture time
+
+
+def image_set_key(entries):
+    """Fingerprint an image set of (path, size) entries.
+
+    Uses each file's name, size and first few KiB rather than mtimes, which
+    a fresh fetch/extract of the same scan resets on every run.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for path, size in entries:
+        with open(path, "rb") as f:
+            head = f.read(IMAGE_KEY_HEAD_BYTES)
+        h.update(f"{os.path.basename(path)}\0{size}\0".encode())
+        h.update(hashlib.blake2b(head, digest_size=16).digest())
+    return h.hexdigest()
+
+
+def read_result_cache(cache_file):
+    """Return the result path recorded in cache_file if fresh and still on disk."""
+    try:
+        if time.time() - os.path.getmtime(cache_file) > RESULT_CACHE_TTL:
+            return None
+        with open(cache_file) as f:
+            result_path = f.read().strip()
+    except OSError:
+        return None
+    if result_path and os.path.isfile(result_path) and os.path.getsize(result_path) > 0:
+        return result_path
+    return None
+
+
+def _read_image(path):
+    """Read one image into memory along with its zip entry header."""
+    info = ZipInfo.from_file(path, os.path.basename(path))
+    info.compress_type = ZIP_STORED
+    with open(path, "rb") as f:
+        return info, f.read()
+
+
 def zip_and_split(images, temp_dir, project_name):
     """Zip images and split into parts if needed."""
     os.makedirs(temp_dir, exist_ok=True)
 
     zip_path = os.path.join(temp_dir, f"{project_name}.zip")
     print(f"Zipping {len(images)} images...")
-    with ZipFile(zip_path, "w") as zf:
+    # JPEG/PNG are already compressed — deflating them only burns CPU on the Pi.
+    # Reader threads pull images off the SD card while this thread writes the
+    # zip in order; the bounded read-ahead keeps memory to a few images.
+    with ZipFile(zip_path, "w", ZIP_STORED) as zf, \
+            ThreadPoolExecutor(max_workers=ZIP_READ_WORKERS) as pool:
+        pending = deque()
         for img in images:
-            zf.write(img, os.path.basename(img))
+            pending.append(pool.submit(_read_image, img))
+            if len(pending) >= ZIP_READ_AHEAD:
+                zf.writestr(*pending.popleft().result())
+        while pending:
+            zf.writestr(*pending.popleft().result())
 
     filesize = os.path.getsize(zip_path)
     print(f"Zip size: {filesize / 1e6:.1f} MB")
@@ -123,29 +194,72 @@ def zip_and_split(images, temp_dir, project_name):
     if filesize <= MAX_PART_SIZE:
         return [zip_path], filesize
 
-    # Split into parts
+    # Split into parts with sendfile(2) so bytes never pass through user space
     parts = []
-    part_num = 1
+    offset = 0
     with open(zip_path, "rb") as f:
-        while True:
-            chunk = f.read(MAX_PART_SIZE)
-            if not chunk:
-                break
-            part_path = f"{zip_path}_part{part_num}"
+        while offset < filesize:
+            part_path = f"{zip_path}_part{len(parts) + 1}"
+            end = min(offset + MAX_PART_SIZE, filesize)
             with open(part_path, "wb") as pf:
-                pf.write(chunk)
+                while offset < end:
+                    sent = os.sendfile(pf.fileno(), f.fileno(), offset, end - offset)
+                    if sent == 0:
+                        raise RuntimeError(f"Short read splitting {zip_path}")
+                    offset += sent
             parts.append(part_path)
-            part_num += 1
 
     os.remove(zip_path)
     print(f"Split into {len(parts)} parts")
     return parts, filesize
 
 
+def download_result(session, url, result_path):
+    """Stream url to result_path, resuming with Range requests after drops.
+
+    Streams straight to disk so large results never sit in the Pi's RAM.
+    A HEAD request first fails fast on a dead link and learns the size.
+    """
+    h = session.head(url, timeout=30, allow_redirects=True)
+    if h.status_code in (404, 410):
+        raise RuntimeError(f"Download link is gone: HTTP {h.status_code}")
+    total = int(h.headers.get("Content-Length") or 0) if h.status_code == 200 else 0
+
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        done = os.path.getsize(result_path) if os.path.exists(result_path) else 0
+        if total and done == total:
+            return
+        headers = {"Range": f"bytes={done}-"} if total and 0 < done < total else {}
+        try:
+            with session.get(url, stream=True, timeout=300, allow_redirects=True,
+                             headers=headers) as r:
+                if r.status_code == 206:
+                    mode = "ab"
+                elif r.status_code == 200:
+                    mode = "wb"  # server ignored Range — start over
+                else:
+                    raise RuntimeError(f"Download failed: HTTP {r.status_code}")
+                r.raw.decode_content = True
+                with open(result_path, mode) as f:
+                    shutil.copyfileobj(r.raw, f, length=1 << 20)
+            if not total or os.path.getsize(result_path) >= total:
+                return
+        # Reading r.raw directly surfaces mid-stream drops as urllib3 errors
+        # (ProtocolError etc.) rather than requests' wrapped ones
+        except (requests.exceptions.RequestException, Urllib3Error) as e:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise RuntimeError(f"Download failed after {attempt} attempts: {e}")
+            print(f"  Download interrupted ({e}), resuming...")
+    raise RuntimeError(f"Download incomplete: {os.path.getsize(result_path)} of {total} bytes")
+
+
 def upload_and_process(image_dir, output_dir, env_path, project_name=None, poll_interval=60):
     """
     Full upload pipeline: zip → create project → upload → start → poll → download.
-    
+
+    poll_interval is the maximum seconds between status polls; polling
+    starts from the queue estimate and backs off (with jitter) up to it.
+
     Returns path to downloaded result file, or raises RuntimeError on failure.
     """
     config = load_env(env_path)
@@ -157,118 +271,161 @@ def upload_and_process(image_dir, output_dir, env_path, project_name=None, poll_
     if not token:
         raise RuntimeError("OSC_TOKEN not set in config")
 
+    cache_mode = config.get("CLOUD_CACHE", "readWrite")
+    if cache_mode not in CACHE_MODES:
+        raise RuntimeError(f"CLOUD_CACHE must be one of {', '.join(CACHE_MODES)}, got '{cache_mode}'")
+
     client = OpenScanCloudClient(server, token, user, password)
 
-    # Verify token
-    token_info = client.get_token_info()
-
-    # Collect images
-    images = collect_images(image_dir)
-    if not images:
-        raise RuntimeError(f"No images found in {image_dir}")
-    print(f"Found {len(images)} images")
-
-    # Check limits
-    limit_photos = token_info.get("limit_photos", 999)
-    limit_filesize = token_info.get("limit_filesize", 2_000_000_000)
-    if len(images) > limit_photos:
-        raise RuntimeError(f"Too many photos: {len(images)} > limit {limit_photos}")
-
-    # Generate project name — API expects simple alphanumeric-OSC.zip format
-    import re
-    if project_name:
-        # Strip .zip and sanitize: keep only alphanumeric, dash, underscore
-        label = project_name.replace(".zip", "")
-        label = re.sub(r'[^a-zA-Z0-9_-]', '_', label)
-    else:
-        label = "scan"
-    project_name = f"{int(time.time() * 100)}-{label}-OSC.zip"
-
-    # Zip and split
-    temp_dir = os.path.join(output_dir, "temp")
-    parts, filesize = zip_and_split(images, temp_dir, project_name)
-
-    if filesize > limit_filesize:
-        raise RuntimeError(f"File too large: {filesize} > limit {limit_filesize}")
-
-    # Create project
-    upload_links = client.create_project(project_name, len(images), len(parts), filesize)
-    if not upload_links:
-        raise RuntimeError("No upload links received from server")
-
-    # Upload parts
-    for i, (part, link) in enumerate(zip(parts, upload_links)):
-        print(f"Uploading part {i + 1}/{len(parts)}...")
-        client.upload_part(link, part)
-
-    # Start processing
-    client.start_project(project_name)
-
-    # Poll for completion
-    print("Waiting for OpenScanCloud processing...")
-    queue = client.get_queue_estimate()
-    if queue:
-        print(f"Queue estimate: {json.dumps(queue)}")
-
-    max_wait = 3600  # 1 hour max
-    start_time = time.time()
-
-    while time.time() - start_time < max_wait:
-        time.sleep(poll_interval)
-        info = client.get_project_info(project_name)
-        status = info.get("status", "unknown")
-        print(f"  Status: {status} (elapsed: {int(time.time() - start_time)}s)")
-
-        if "done" in status.lower():
-            dlink = info.get("dlink", "")
-            if not dlink:
-                raise RuntimeError("Processing done but no download link")
-
-            # Extract direct Dropbox URL from the OpenScanCloud redirect link
-            # dlink format: https://www.openscan.eu/osc?id=<dropbox_url>&dl=0
-            # We need the Dropbox URL with dl=1 for direct download
-            direct_url = dlink
-            if "dropbox.com" in dlink:
-                import re
-                match = re.search(r'(https?://[^&]*dropbox\.com/[^&]+)', dlink)
-                if match:
-                    direct_url = match.group(1)
-                    direct_url = re.sub(r'[?&]dl=\d', '', direct_url) + '&dl=1'
-                    if '?' not in direct_url.split('dl=')[0]:
-                        direct_url = direct_url.replace('&dl=1', '?dl=1')
-
-            print(f"Downloading result...")
-            os.makedirs(output_dir, exist_ok=True)
-
-            r = requests.get(direct_url, timeout=300, allow_redirects=True)
-            if r.status_code != 200:
-                raise RuntimeError(f"Download failed: HTTP {r.status_code}")
-            if len(r.content) < 1000 or b'<!doctype' in r.content[:200].lower():
-                raise RuntimeError("Download returned HTML instead of file")
-
-            # Determine filename from URL or content-disposition
-            ext = ".zip"
-            if "." in dlink.split("/")[-1]:
-                ext = "." + dlink.split("/")[-1].split(".")[-1]
-
-            result_filename = project_name.replace(".zip", "") + "_result" + ext
-            result_path = os.path.join(output_dir, result_filename)
-            with open(result_path, "wb") as f:
-                f.write(r.content)
-
-            print(f"Result saved: {result_path} ({len(r.content) / 1e6:.1f} MB)")
-
-            # Cleanup temp files
-            for part in parts:
-                if os.path.exists(part):
-                    os.remove(part)
-
-            return result_path
-
-        elif "failed" in status.lower() or "error" in status.lower():
-            raise RuntimeError(f"OpenScanCloud processing failed: {json.dumps(info)}")
-
-    raise RuntimeError(f"Timed out after {max_wait}s waiting for processing")
+    try:
+        # Collect images
+        entries = collect_images(image_dir)
+        if not entries:
+            raise RuntimeError(f"No images found in {image_dir}")
+        images = [path for path, _ in entries]
+        images_size = sum(size for _, size in entries)
+        print(f"Found {len(images)} images ({images_size / 1e6:.1f} MB)")
+
+        # Re-runs of an unchanged scan reuse the earlier result
+        cache_file = None
+        if cache_mode != "off":
+            cache_file = os.path.join(output_dir, f"{image_set_key(entries)}.result")
+            cached = read_result_cache(cache_file)
+            if cached:
+                print(f"X-Cache: HIT — reusing result for unchanged images: {cached}")
+                return cached
+            print("X-Cache: MISS")
+
+        # Verify token and fetch the queue estimate while the images are zipped
+        control = ThreadPoolExecutor(max_workers=2)
+        token_fut = control.submit(client.get_token_info)
+        queue_fut = control.submit(client.get_queue_estimate)
+        control.shutdown(wait=False)
+
+        # Generate project name — API expects simple alphanumeric-OSC.zip format
+        import re
+        if project_name:
+            # Strip .zip and sanitize: keep only alphanumeric, dash, underscore
+            label = project_name.replace(".zip", "")
+            label = re.sub(r'[^a-zA-Z0-9_-]', '_', label)
+        else:
+            label = "scan"
+        project_name = f"{int(time.time() * 100)}-{label}-OSC.zip"
+
+        # Zip and split
+        temp_dir = os.path.join(output_dir, "temp")
+        parts, filesize = zip_and_split(images, temp_dir, project_name)
+
+        # Check limits
+        token_info = token_fut.result()
+        limit_photos = token_info.get("limit_photos", 999)
+        limit_filesize = token_info.get("limit_filesize", 2_000_000_000)
+        if len(images) > limit_photos:
+            raise RuntimeError(f"Too many photos: {len(images)} > limit {limit_photos}")
+        if filesize > limit_filesize:
+            raise RuntimeError(f"File too large: {filesize} > limit {limit_filesize}")
+
+        # Create project
+        upload_links = client.create_project(project_name, len(images), len(parts), filesize)
+        if not upload_links:
+            raise RuntimeError("No upload links received from server")
+
+        # Upload parts concurrently — each part has its own independent upload link
+        print(f"Uploading {len(parts)} part(s)...")
+        with ThreadPoolExecutor(max_workers=min(len(parts), MAX_UPLOAD_WORKERS)) as pool:
+            futures = [pool.submit(client.upload_part, link, part)
+                       for part, link in zip(parts, upload_links)]
+            for fut in as_completed(futures):
+                fut.result()
+
+        # Start processing
+        client.start_project(project_name)
+
+        # Poll for completion
+        print("Waiting for OpenScanCloud processing...")
+        queue = queue_fut.result()
+        if queue:
+            print(f"Queue estimate: {json.dumps(queue)}")
+
+        max_wait = 3600  # 1 hour max
+        start_time = time.monotonic()
+
+        # Poll quickly at first, backing off geometrically up to poll_interval
+        try:
+            estimate = int(queue.get("estimated_seconds", 30))
+        except (TypeError, ValueError):
+            estimate = 30
+        first_delay = min(max(MIN_POLL_INTERVAL, estimate // 2), poll_interval)
+
+        def next_delay(attempt):
+            delay = min(first_delay * POLL_BACKOFF ** attempt, poll_interval)
+            return delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+        attempt = 0
+        while time.monotonic() - start_time < max_wait:
+            time.sleep(next_delay(attempt))
+            attempt += 1
+            info = client.get_project_info(project_name)
+            status = info.get("status", "unknown")
+            print(f"  Status: {status} (elapsed: {int(time.monotonic() - start_time)}s)")
+
+            if "done" in status.lower():
+                dlink = info.get("dlink", "")
+                if not dlink:
+                    raise RuntimeError("Processing done but no download link")
+
+                # Extract direct Dropbox URL from the OpenScanCloud redirect link
+                # dlink format: https://www.openscan.eu/osc?id=<dropbox_url>&dl=0
+                # We need the Dropbox URL with dl=1 for direct download
+                direct_url = dlink
+                if "dropbox.com" in dlink:
+                    import re
+                    match = re.search(r'(https?://[^&]*dropbox\.com/[^&]+)', dlink)
+                    if match:
+                        direct_url = match.group(1)
+                        direct_url = re.sub(r'[?&]dl=\d', '', direct_url) + '&dl=1'
+                        if '?' not in direct_url.split('dl=')[0]:
+                            direct_url = direct_url.replace('&dl=1', '?dl=1')
+
+                print(f"Downloading result...")
+                os.makedirs(output_dir, exist_ok=True)
+
+                # Determine filename from URL or content-disposition
+                ext = ".zip"
+                if "." in dlink.split("/")[-1]:
+                    ext = "." + dlink.split("/")[-1].split(".")[-1]
+
+                result_filename = project_name.replace(".zip", "") + "_result" + ext
+                result_path = os.path.join(output_dir, result_filename)
+
+                download_result(client.session, direct_url, result_path)
+
+                result_size = os.path.getsize(result_path)
+                with open(result_path, "rb") as f:
+                    head = f.read(200)
+                if result_size < 1000 or b'<!doctype' in head.lower():
+                    os.remove(result_path)
+                    raise RuntimeError("Download returned HTML instead of file")
+
+                print(f"Result saved: {result_path} ({result_size / 1e6:.1f} MB)")
+
+                if cache_mode == "readWrite":
+                    with open(cache_file, "w") as f:
+                        f.write(result_path)
+
+                # Cleanup temp files
+                for part in parts:
+                    if os.path.exists(part):
+                        os.remove(part)
+
+                return result_path
+
+            elif "failed" in status.lower() or "error" in status.lower():
+                raise RuntimeError(f"OpenScanCloud processing failed: {json.dumps(info)}")
+
+        raise RuntimeError(f"Timed out after {max_wait}s waiting for processing")
+    finally:
+        client.close()
 
 
 if __name__ == "__main__":
@@ -3,70 +3,152 @@
 Network discovery for OpenScan Mini (mDNS/Samba) and Bambu printer (SSDP/port scan).
 Runs on the Raspberry Pi.
 """
+import os
 import socket
+import struct
 import subprocess
 import sys
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_fetch import parse_smb_ls, smb_auth_args
+
+
+MDNS_ADDR = "224.0.0.251"
+MDNS_PORT = 5353
+IP_CACHE_FILE = "/tmp/openscan_ip"
+IP_CACHE_TTL = 60  # seconds
+
+
+def _read_dns_name(data, offset):
+    """Decode a (possibly compressed) DNS name; returns (name, next_offset)."""
+    labels = []
+    end = None
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode(errors="replace"))
+        offset += length
+    return ".".join(labels), (end if end is not None else offset)
+
+
+def mdns_resolve(hostname, timeout=2):
+    """Resolve a .local hostname with a one-shot mDNS A query (RFC 6762).
+
+    Pure-socket replacement for forking avahi-resolve; asks for a unicast
+    reply so no multicast group membership is needed.
+    """
+    qname = b"".join(bytes([len(p)]) + p.encode() for p in hostname.rstrip(".").split("."))
+    # id=0, flags=0, 1 question; QTYPE=A, QCLASS=IN with the unicast-response bit
+    query = struct.pack("!6H", 0, 0, 1, 0, 0, 0) + qname + b"\x00" + struct.pack("!2H", 1, 0x8001)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        sock.sendto(query, (MDNS_ADDR, MDNS_PORT))
+        while True:
+            data, _ = sock.recvfrom(4096)
+            try:
+                _, _, qdcount, ancount, nscount, arcount = struct.unpack("!6H", data[:12])
+                offset = 12
+                for _ in range(qdcount):
+                    _, offset = _read_dns_name(data, offset)
+                    offset += 4
+                for _ in range(ancount + nscount + arcount):
+                    name, offset = _read_dns_name(data, offset)
+                    rtype, _, _, rdlength = struct.unpack("!2HIH", data[offset:offset + 10])
+                    offset += 10
+                    if rtype == 1 and rdlength == 4 and name.lower() == hostname.lower().rstrip("."):
+                        return socket.inet_ntoa(data[offset:offset + 4])
+                    offset += rdlength
+            except (IndexError, struct.error):
+                continue  # malformed or unrelated packet
+    except (socket.timeout, OSError):
+        return None
+    finally:
+        sock.close()
 
 
-def discover_openscan(hostname="openscan.local", timeout=3):
-    """Try to resolve OpenScan Mini via mDNS."""
+def _read_ip_cache(hostname):
+    try:
+        if time.time() - os.path.getmtime(IP_CACHE_FILE) > IP_CACHE_TTL:
+            return None
+        with open(IP_CACHE_FILE) as f:
+            cached_host, ip = f.read().split()
+        return ip if cached_host == hostname else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_ip_cache(hostname, ip):
+    try:
+        with open(IP_CACHE_FILE, "w") as f:
+            f.write(f"{hostname} {ip}\n")
+    except OSError:
+        pass
+
+
+def lookup_openscan(hostname="openscan.local", timeout=3):
+    """Resolve OpenScan Mini afresh (resolver, then raw mDNS), bypassing the cache.
+
+    Quiet; a found address is written back to the cache.
+    """
+    addr = None
     try:
         ip = socket.getaddrinfo(hostname, None, socket.AF_INET, socket.SOCK_STREAM, 0, 0)
         if ip:
             addr = ip[0][4][0]
-            print(f"OpenScan found: {addr} ({hostname})")
-            return addr
     except socket.gaierror:
         pass
 
-    # Fallback: try avahi-resolve
-    try:
-        result = subprocess.run(
-            ["avahi-resolve", "-n", hostname, "-4"],
-            capture_output=True, text=True, timeout=timeout
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            parts = result.stdout.strip().split()
-            if len(parts) >= 2:
-                addr = parts[1]
-                print(f"OpenScan found via avahi: {addr}")
-                return addr
-    except (subprocess.TimeoutExpired, FileNotFoundError):
-        pass
+    # Fallback: query mDNS directly (no nss-mdns / avahi-daemon needed)
+    if not addr:
+        addr = mdns_resolve(hostname, timeout=timeout)
+    if addr:
+        _write_ip_cache(hostname, addr)
+    return addr
 
-    return None
+
+def discover_openscan(hostname="openscan.local", timeout=3):
+    """Try to resolve OpenScan Mini via mDNS."""
+    addr = _read_ip_cache(hostname)
+    if addr:
+        print(f"OpenScan found: {addr} ({hostname}, cached)")
+        return addr
+
+    addr = lookup_openscan(hostname, timeout=timeout)
+    if addr:
+        print(f"OpenScan found: {addr} ({hostname})")
+    return addr
 
 
 def check_openscan_samba(ip, timeout=3):
     """Verify Samba port 445 is open on OpenScan."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(timeout)
     try:
-        result = sock.connect_ex((ip, 445))
-        return result == 0
-    finally:
-        sock.close()
+        with socket.create_connection((ip, 445), timeout=timeout):
+            return True
+    except OSError:
+        return False
 
 
 def list_openscan_scans(ip, smb_user="pi", smb_pass="raspberry"):
     """List scan directories available on OpenScan Samba share."""
     try:
         result = subprocess.run(
-            ["smbclient", f"//{ip}/PiShare", "-U", f"{smb_user}%{smb_pass}",
+            ["smbclient", f"//{ip}/PiShare", *smb_auth_args(smb_user, smb_pass),
              "-c", "ls OpenScan/scans/*"],
             capture_output=True, text=True, timeout=10
         )
         if result.returncode == 0:
-            dirs = []
-            for line in result.stdout.strip().split("\n"):
-                line = line.strip()
-                if line and "D" in line and not line.startswith("."):
-                    # Parse smbclient ls output: "dirname  D  0  date"
-                    parts = line.split()
-                    if parts and parts[0] not in (".", ".."):
-                        dirs.append(parts[0])
-            return dirs
+            return [name for name, is_dir in parse_smb_ls(result.stdout.splitlines())
+                    if is_dir and not name.startswith(".")]
     except (subprocess.TimeoutExpired, FileNotFoundError) as e:
         print(f"WARNING: Could not list scans: {e}", file=sys.stderr)
     return []
@@ -82,10 +164,17 @@ def discover_all(openscan_host="openscan.local", smb_user="pi", smb_pass="raspbe
         return result
 
     result["openscan_ip"] = ip
-    result["samba_ok"] = check_openscan_samba(ip)
+
+    # Probe the port and list scans concurrently; the listing is only
+    # trusted if the port probe succeeds.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        samba_fut = pool.submit(check_openscan_samba, ip)
+        scans_fut = pool.submit(list_openscan_scans, ip, smb_user, smb_pass)
+        result["samba_ok"] = samba_fut.result()
+        scans = scans_fut.result()
 
     if result["samba_ok"]:
-        result["scans"] = list_openscan_scans(ip, smb_user, smb_pass)
+        result["scans"] = scans
         print(f"Available scans: {result['scans']}")
 
     return result
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Shared .env loader for the 3d-printline scripts.
+Parses KEY=value lines with one compiled regex and memoizes by (path, mtime).
+"""
+import functools
+import os
+import re
+
+_ENV_RE = re.compile(r"^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.M)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_env(env_path, mtime_ns):
+    with open(env_path) as f:
+        return dict(_ENV_RE.findall(f.read()))
+
+
+def load_env(env_path):
+    """Load .env file into a dict (a fresh copy the caller may modify)."""
+    return dict(_parse_env(env_path, os.stat(env_path).st_mtime_ns))
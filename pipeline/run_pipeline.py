@@ -12,16 +12,41 @@ The laptop-side orchestrate.py calls this via SSH and handles
 steps 3–6 (transfer, decimate, slice, print) locally.
 """
 import argparse
+import importlib
 import json
 import os
+import queue
+import shutil
 import signal
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from discover import check_openscan_samba, discover_openscan
+from envutil import load_env
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PIDFILE = os.path.join(SCRIPT_DIR, ".pipeline.pid")
 VERBOSE = False
+STEP_TIMINGS = []  # (step name, seconds, ok) for the end-of-run summary line
+
+
+def wait_for_exit(pids, timeout=0.5):
+    """Poll until every pid has exited or timeout elapses; no-op when empty."""
+    deadline = time.monotonic() + timeout
+    pending = set(pids)
+    while pending and time.monotonic() < deadline:
+        for pid in list(pending):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                pending.discard(pid)
+            except PermissionError:
+                pass
+        if pending:
+            time.sleep(0.02)
 
 
 def enforce_singleton():
@@ -30,24 +55,29 @@ def enforce_singleton():
     my_ppid = os.getppid()
     safe_pids = {my_pid, my_ppid}
 
-    # Find all python run_pipeline processes
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", "python3.*run_pipeline\\.py"],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.stdout.strip():
-            for line in result.stdout.strip().split("\n"):
-                pid = int(line.strip())
-                if pid not in safe_pids:
-                    print(f"Killing previous pipeline PID {pid}...")
-                    try:
-                        os.kill(pid, signal.SIGKILL)
-                    except (ProcessLookupError, PermissionError):
-                        pass
-            time.sleep(0.5)
-    except (subprocess.TimeoutExpired, FileNotFoundError, ValueError):
-        pass
+    # Find all python run_pipeline processes by walking /proc (no pgrep fork)
+    killed = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        if pid in safe_pids:
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().split(b"\0")
+        except OSError:
+            continue
+        if not os.path.basename(argv[0]).startswith(b"python"):
+            continue
+        if any(os.path.basename(arg) == b"run_pipeline.py" for arg in argv[1:]):
+            print(f"Killing previous pipeline PID {pid}...")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                killed.append(pid)
+            except (ProcessLookupError, PermissionError):
+                pass
+    wait_for_exit(killed)
 
     with open(PIDFILE, "w") as f:
         f.write(str(my_pid))
@@ -70,40 +100,20 @@ def vlog(msg):
         print(f"  [verbose] {msg}")
 
 
-def load_env(env_path):
-    """Load .env file into a dict."""
-    config = {}
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    return config
-
-
 OPENCLAW_BIN = "/home/sanchobot/.npm-global/bin/openclaw"
 TELEGRAM_TARGET = ""
+_OPENCLAW_OK = None  # None = not checked yet; False = binary missing, skip notifies
+_notify_queue = queue.Queue()
+_notifier_lock = threading.Lock()
+_notifier = None
 
 
-def notify(message, is_error=False):
-    """Send notification via OpenClaw Telegram (gracefully skips if not configured)."""
-    prefix = "❌" if is_error else "ℹ️"
-    full_msg = f"{prefix} 3d-printline: {message}"
-    print(full_msg)
-
-    target = TELEGRAM_TARGET
-    if not target:
-        vlog("notify skipped: TELEGRAM_TARGET not set")
-        return
-
+def _send_notification(full_msg):
     try:
         ocbin = os.environ.get("OPENCLAW_BIN", OPENCLAW_BIN)
         cmd = [ocbin, "message", "send", "--channel", "telegram",
-               "--target", target, "--message", full_msg]
-        vlog(f"notify → {target}")
+               "--target", TELEGRAM_TARGET, "--message", full_msg]
+        vlog(f"notify → {TELEGRAM_TARGET}")
         result = subprocess.run(cmd, timeout=30, capture_output=True, text=True)
         vlog(f"notify rc={result.returncode}")
         if result.returncode != 0:
@@ -112,40 +122,108 @@ def notify(message, is_error=False):
         vlog(f"notify error: {e}")
 
 
+def _notifier_loop():
+    """Send queued notifications, coalescing any that pile up mid-send."""
+    while True:
+        batch = [_notify_queue.get()]
+        while batch[-1] is not None:
+            try:
+                batch.append(_notify_queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = batch[-1] is None
+        messages = [m for m in batch if m is not None]
+        if messages:
+            _send_notification("\n".join(messages))
+        if stop:
+            return
+
+
+def notify(message, is_error=False):
+    """Send notification via OpenClaw Telegram (gracefully skips if not configured).
+
+    Sending happens on a background thread so openclaw's startup cost never
+    blocks the pipeline; call flush_notifications() before exiting.
+    """
+    global _notifier, _OPENCLAW_OK
+    prefix = "❌" if is_error else "ℹ️"
+    full_msg = f"{prefix} 3d-printline: {message}"
+    print(full_msg)
+
+    if not TELEGRAM_TARGET:
+        vlog("notify skipped: TELEGRAM_TARGET not set")
+        return
+    if _OPENCLAW_OK is None:
+        _OPENCLAW_OK = shutil.which(os.environ.get("OPENCLAW_BIN", OPENCLAW_BIN)) is not None
+        if not _OPENCLAW_OK:
+            vlog("notify disabled: openclaw binary not found")
+    if not _OPENCLAW_OK:
+        return
+
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = threading.Thread(target=_notifier_loop, daemon=True)
+            _notifier.start()
+    _notify_queue.put(full_msg)
+
+
+def flush_notifications(timeout=60):
+    """Wait for queued notifications to be sent."""
+    if _notifier is not None:
+        _notify_queue.put(None)
+        _notifier.join(timeout)
+
+
 def run_step(step_name, func, *args, **kwargs):
     """Run a pipeline step with error handling and timing."""
     print(f"\n{'='*60}")
     print(f"STEP: {step_name}")
     print(f"{'='*60}")
-    start = time.time()
+    start = time.monotonic()
     try:
         result = func(*args, **kwargs)
-        elapsed = time.time() - start
+        elapsed = time.monotonic() - start
+        STEP_TIMINGS.append((step_name, elapsed, True))
         print(f"✓ {step_name} completed in {elapsed:.0f}s")
         return result
     except Exception as e:
-        elapsed = time.time() - start
+        elapsed = time.monotonic() - start
+        STEP_TIMINGS.append((step_name, elapsed, False))
         error_msg = f"{step_name} failed after {elapsed:.0f}s: {e}"
         print(f"✗ {error_msg}", file=sys.stderr)
         notify(error_msg, is_error=True)
         raise
 
 
-def step_discover(config):
-    """Step 0: Discover OpenScan Mini."""
-    from discover import discover_openscan, check_openscan_samba
+def log_step_timings():
+    """Print per-step timings as one JSON line for offline analysis."""
+    steps = [{"step": name, "seconds": round(secs, 3), "ok": ok}
+             for name, secs, ok in STEP_TIMINGS]
+    print("STEP_TIMINGS=" + json.dumps(steps), flush=True)
+
+
+def step_discover(config, resolve_future=None):
+    """Step 0: Discover OpenScan Mini.
 
+    resolve_future, if given, is an in-flight discover_openscan() call.
+    """
     host = config.get("OPENSCAN_HOST", "openscan.local")
     vlog(f"Resolving {host}...")
-    ip = discover_openscan(host)
+    ip = resolve_future.result() if resolve_future else discover_openscan(host)
     if not ip:
         raise RuntimeError(f"OpenScan not found at {host}")
     vlog(f"OpenScan IP: {ip}")
-    samba_ok = check_openscan_samba(ip)
+    # The Samba port is only probed if a fetch fails (see _samba_error)
+    return ip
+
+
+def _samba_error(openscan_ip, message):
+    """Error for a failed Samba operation, naming the port if it's unreachable."""
+    samba_ok = check_openscan_samba(openscan_ip)
     vlog(f"Samba port 445 open: {samba_ok}")
     if not samba_ok:
-        raise RuntimeError(f"Samba not accessible on {ip}")
-    return ip
+        return RuntimeError(f"Samba not accessible on {openscan_ip}")
+    return RuntimeError(message)
 
 
 def step_fetch(config, openscan_ip, project_name):
@@ -160,12 +238,15 @@ def step_fetch(config, openscan_ip, project_name):
     if not project_name:
         project_name = get_latest_scan(openscan_ip, smb_user, smb_pass)
         if not project_name:
-            raise RuntimeError("No scans found on OpenScan")
+            raise _samba_error(openscan_ip, "No scans found on OpenScan")
         print(f"Auto-detected latest scan: {project_name}")
 
     vlog(f"Fetching from //{openscan_ip}/PiShare/OpenScan/scans/{project_name}")
     vlog(f"Output dir: {output_dir}")
-    files = fetch_scan(openscan_ip, project_name, output_dir, smb_user, smb_pass)
+    try:
+        files = fetch_scan(openscan_ip, project_name, output_dir, smb_user, smb_pass)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        raise _samba_error(openscan_ip, str(e)) from e
     if not files:
         raise RuntimeError("No images downloaded")
     vlog(f"Fetched {len(files)} files, first: {files[0]}")
@@ -182,18 +263,21 @@ def step_cloud_upload(config, image_dir, project_name):
 
     scandata_dir = config.get("SCANDATA_DIR", "/mnt/scandata")
     output_dir = os.path.join(scandata_dir, "results")
-    poll_interval = int(config.get("CLOUD_POLL_INTERVAL", "60"))
+    poll_interval = int(config.get("CLOUD_POLL_INTERVAL", "300"))
     env_path = config["_env_path"]
 
     vlog(f"image_dir: {image_dir}")
     vlog(f"output_dir: {output_dir}")
-    vlog(f"poll_interval: {poll_interval}s")
+    vlog(f"poll_interval: backoff up to {poll_interval}s")
     notify(f"Uploading scan '{project_name}' to OpenScanCloud...")
     result_path = upload_and_process(
         image_dir, output_dir, env_path,
         project_name=project_name, poll_interval=poll_interval
     )
     vlog(f"Result file: {result_path}")
+    # Machine-readable output line for the laptop orchestrator. Emitted as soon
+    # as the file is on disk so the laptop's pull overlaps our notify/teardown.
+    print(f"RESULT_PATH={result_path}", flush=True)
     notify(f"OpenScanCloud processing complete for '{project_name}'")
     return result_path
 
@@ -215,12 +299,21 @@ def run_pipeline(env_path, project_name=None, verbose=False):
     vlog(f"Env path: {env_path}")
     vlog(f"Telegram target: {'(not set)' if not TELEGRAM_TARGET else TELEGRAM_TARGET}")
 
-    pipeline_start = time.time()
+    pipeline_start = time.monotonic()
+    atexit.register(flush_notifications)
     notify(f"Pi worker starting{f' for project: {project_name}' if project_name else ''}...")
 
+    # Overlap independent startup work with discovery: the mDNS lookup and
+    # importing cloud_upload (which pulls in requests — slow on a Pi)
+    background = ThreadPoolExecutor(max_workers=2)
+    resolve_future = background.submit(discover_openscan,
+                                       config.get("OPENSCAN_HOST", "openscan.local"))
+    background.submit(importlib.import_module, "cloud_upload")
+    background.shutdown(wait=False)
+
     try:
         # Step 0: Discover
-        openscan_ip = run_step("Discover OpenScan", step_discover, config)
+        openscan_ip = run_step("Discover OpenScan", step_discover, config, resolve_future)
 
         # Step 1: Fetch
         image_dir, project_name = run_step("Fetch Scan", step_fetch, config, openscan_ip, project_name)
@@ -228,15 +321,15 @@ def run_pipeline(env_path, project_name=None, verbose=False):
         # Step 2: Cloud upload + process
         result_path = run_step("Cloud Upload & Process", step_cloud_upload, config, image_dir, project_name)
 
-        elapsed = time.time() - pipeline_start
+        elapsed = time.monotonic() - pipeline_start
         print(f"\nPi worker done in {elapsed / 60:.1f} minutes")
-        # Machine-readable output line for the laptop orchestrator
-        print(f"RESULT_PATH={result_path}")
 
     except Exception as e:
-        elapsed = time.time() - pipeline_start
+        elapsed = time.monotonic() - pipeline_start
         notify(f"Pi worker failed after {elapsed / 60:.1f} minutes: {e}", is_error=True)
         sys.exit(1)
+    finally:
+        log_step_timings()
 
 
 if __name__ == "__main__":
@@ -2,11 +2,145 @@
 """Fetch scan images from OpenScan Mini via Samba share.
 Copies JPGs (or zip of JPGs) from the scanner to the local 1TB drive on the Pi.
 """
+import atexit
 import os
+import re
 import subprocess
 import sys
+import tempfile
+import threading
 import zipfile
 
+try:  # optional: smbprotocol keeps one SMB session open across listings
+    import smbclient
+    from smbprotocol.exceptions import SMBException
+except ImportError:
+    smbclient = None
+
+try:  # optional: extract zip entries while the download is still running
+    from stream_unzip import stream_unzip
+except ImportError:
+    stream_unzip = None
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+# One `smbclient ls` entry: name (may contain spaces), attribute letters,
+# size, then a date like "Sun Dec  1 10:00:00 2024"
+_SMB_LS_RE = re.compile(
+    r"^\s+(.+?)\s+([A-Z]*)\s+(\d+)\s+\w{3} \w{3} [ \d]\d \d\d:\d\d:\d\d \d{4}$")
+
+_smb_sessions = set()
+_smb_auth_files = {}
+
+# Let smbclient negotiate SMB3 (multi-credit large reads) and use big socket
+# buffers, so bulk downloads need fewer round trips per MB
+SMB_TRANSFER_OPTIONS = [
+    "--option=client max protocol=SMB3",
+    "--option=socket options=TCP_NODELAY SO_RCVBUF=1048576 SO_SNDBUF=1048576",
+]
+
+
+def parse_smb_ls(lines):
+    """Yield (name, is_dir) for each entry in `smbclient ls` output lines."""
+    for line in lines:
+        m = _SMB_LS_RE.match(line.rstrip("\n"))
+        if m and m.group(1) not in (".", ".."):
+            yield m.group(1), "D" in m.group(2)
+
+
+def is_scan_entry(name, is_dir):
+    """A scan is a zip file or a directory (but not 'preview')."""
+    return name.endswith(".zip") or (is_dir and name != "preview")
+
+
+def _iter_images(directory):
+    """Recursively yield image paths using scandir's cached dirent types."""
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_images(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                yield entry.path
+
+
+def _remove_smb_auth_files():
+    for path in _smb_auth_files.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    _smb_auth_files.clear()
+
+
+def smb_auth_args(smb_user, smb_pass):
+    """smbclient args that read credentials from a private auth file.
+
+    The file is created once per process (mkstemp: unique name, mode 600)
+    in the per-user runtime dir, which keeps the password out of `ps`, and
+    is removed at exit. If it cannot be written, falls back to -U.
+    """
+    path = _smb_auth_files.get((smb_user, smb_pass))
+    if path is None:
+        run_dir = f"/run/user/{os.getuid()}"
+        if not os.path.isdir(run_dir):
+            run_dir = tempfile.gettempdir()
+        try:
+            fd, path = tempfile.mkstemp(dir=run_dir, prefix="3dpl-smb-", suffix=".auth")
+        except OSError:
+            return ["-U", f"{smb_user}%{smb_pass}"]
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(f"username={smb_user}\npassword={smb_pass}\ndomain=\n")
+        except OSError:
+            os.remove(path)
+            return ["-U", f"{smb_user}%{smb_pass}"]
+        if not _smb_auth_files:
+            atexit.register(_remove_smb_auth_files)
+        _smb_auth_files[(smb_user, smb_pass)] = path
+    return [f"--authentication-file={path}"]
+
+
+def _stream_zip_from_smb(smb_argv, scan_path, project_name, local_dir, timeout=600):
+    """Pipe a zip out of smbclient (`get name -`) and extract it as it arrives.
+
+    No intermediate zip file is written.
+    """
+    smb_cmd = f'cd {scan_path}; get "{project_name}" -'
+    # -E sends smbclient's status messages to stderr, keeping stdout pure zip
+    proc = subprocess.Popen(smb_argv + ["-E", "-c", smb_cmd],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    root = os.path.realpath(local_dir)
+    error = None
+    try:
+        chunks = iter(lambda: proc.stdout.read(1 << 20), b"")
+        for name, _size, unzipped in stream_unzip(chunks):
+            name = name.decode("utf-8", errors="replace")
+            dest = os.path.realpath(os.path.join(root, name))
+            if name.endswith("/") or not dest.startswith(root + os.sep):
+                for _ in unzipped:  # entries must be drained to advance the stream
+                    pass
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, "wb") as f:
+                for chunk in unzipped:
+                    f.write(chunk)
+    except Exception as e:  # truncated/corrupt zip (e.g. smbclient died mid-transfer)
+        error = e
+        proc.kill()
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.wait()
+        timer.cancel()
+    if proc.returncode != 0 or error is not None:
+        print(f"smbclient stderr: {stderr}", file=sys.stderr)
+    if error is not None:
+        raise RuntimeError(f"Failed to fetch scan: {error!r}") from error
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to fetch scan: smbclient exit code {proc.returncode}")
+
 
 def fetch_scan(openscan_ip, project_name, output_dir,
                smb_user="pi", smb_pass="raspberry",
@@ -32,8 +166,15 @@ def fetch_scan(openscan_ip, project_name, output_dir,
     os.makedirs(local_dir, exist_ok=True)
 
     is_zip = project_name.endswith(".zip")
+    smb_argv = ["smbclient", f"//{openscan_ip}/{smb_share}",
+                *smb_auth_args(smb_user, smb_pass), *SMB_TRANSFER_OPTIONS]
 
-    if is_zip:
+    if is_zip and stream_unzip is not None:
+        print(f"Streaming scan '{project_name}' from {openscan_ip}...")
+        print(f"  Local:  {local_dir}")
+        _stream_zip_from_smb(smb_argv, scan_path, project_name, local_dir)
+        smb_cmd = None
+    elif is_zip:
         # Download the zip file first, then extract
         zip_local = os.path.join(output_dir, project_name)
         smb_cmd = f'prompt; lcd {output_dir}; cd {scan_path}; get "{project_name}"'
@@ -42,22 +183,19 @@ def fetch_scan(openscan_ip, project_name, output_dir,
         remote_path = f"{scan_path}/{project_name}"
         smb_cmd = f"recurse; prompt; lcd {local_dir}; cd {remote_path}; mget *"
 
-    print(f"Fetching scan '{project_name}' from {openscan_ip}...")
-    print(f"  Local:  {local_dir}")
+    if smb_cmd:
+        print(f"Fetching scan '{project_name}' from {openscan_ip}...")
+        print(f"  Local:  {local_dir}")
 
-    result = subprocess.run(
-        ["smbclient", f"//{openscan_ip}/{smb_share}",
-         "-U", f"{smb_user}%{smb_pass}",
-         "-c", smb_cmd],
-        capture_output=True, text=True, timeout=600
-    )
+        result = subprocess.run(smb_argv + ["-c", smb_cmd],
+                                capture_output=True, text=True, timeout=600)
 
-    if result.returncode != 0:
-        print(f"smbclient stderr: {result.stderr}", file=sys.stderr)
-        raise RuntimeError(f"Failed to fetch scan: smbclient exit code {result.returncode}")
+        if result.returncode != 0:
+            print(f"smbclient stderr: {result.stderr}", file=sys.stderr)
+            raise RuntimeError(f"Failed to fetch scan: smbclient exit code {result.returncode}")
 
-    # If zip, extract images
-    if is_zip:
+    # If zip was downloaded whole, extract images
+    if is_zip and smb_cmd:
         print(f"Extracting {project_name}...")
         with zipfile.ZipFile(zip_local, "r") as zf:
             zf.extractall(local_dir)
@@ -65,47 +203,69 @@ def fetch_scan(openscan_ip, project_name, output_dir,
         print(f"Extracted to {local_dir}")
 
     # Collect image files (may be in subdirectories after extraction)
-    files = []
-    allowed_ext = {".jpg", ".jpeg", ".png"}
-    for root, dirs, filenames in os.walk(local_dir):
-        for f in filenames:
-            if os.path.splitext(f)[1].lower() in allowed_ext:
-                files.append(os.path.join(root, f))
+    files = list(_iter_images(local_dir))
 
     print(f"Found {len(files)} images in {local_dir}")
     return files
 
 
+def smb_list_scans(openscan_ip, smb_user="pi", smb_pass="raspberry",
+                   smb_share="PiShare", scan_path="OpenScan/scans"):
+    """List (name, is_dir) entries of the scans directory via smbprotocol.
+
+    The session is registered once per host and reused, so each call is a
+    single directory query. Returns None if smbprotocol is not installed or
+    the query fails (the session is dropped and re-created next time).
+    """
+    if smbclient is None:
+        return None
+    try:
+        if openscan_ip not in _smb_sessions:
+            smbclient.register_session(openscan_ip, username=smb_user,
+                                       password=smb_pass, connection_timeout=10)
+            _smb_sessions.add(openscan_ip)
+        unc = "\\\\" + "\\".join([openscan_ip, smb_share] + scan_path.split("/"))
+        return [(e.name, e.is_dir()) for e in smbclient.scandir(unc)
+                if e.name not in (".", "..")]
+    except (SMBException, OSError, ValueError) as e:
+        print(f"smbprotocol listing failed: {e}", file=sys.stderr)
+        _smb_sessions.discard(openscan_ip)
+        try:
+            smbclient.delete_session(openscan_ip)
+        except Exception:
+            pass
+        return None
+
+
 def get_latest_scan(openscan_ip, smb_user="pi", smb_pass="raspberry"):
     """Get the most recent scan entry (zip file or directory)."""
-    result = subprocess.run(
+    listing = smb_list_scans(openscan_ip, smb_user, smb_pass)
+    if listing is not None:
+        entries = [name for name, is_dir in listing if is_scan_entry(name, is_dir)]
+        return entries[-1] if entries else None
+
+    # Stream the listing and keep only the last match; large shares never
+    # get buffered as one string
+    proc = subprocess.Popen(
         ["smbclient", f"//{openscan_ip}/PiShare",
-         "-U", f"{smb_user}%{smb_pass}",
+         *smb_auth_args(smb_user, smb_pass),
          "-c", "ls OpenScan/scans/*"],
-        capture_output=True, text=True, timeout=10
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
     )
-    if result.returncode != 0:
+    timer = threading.Timer(10, proc.kill)
+    timer.start()
+    latest = None
+    try:
+        for name, is_dir in parse_smb_ls(proc.stdout):
+            if is_scan_entry(name, is_dir):
+                latest = name  # last entry is usually the most recent
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        timer.cancel()
+    if proc.returncode != 0:
         return None
-
-    entries = []
-    for line in result.stdout.strip().split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        parts = line.split()
-        if not parts or parts[0] in (".", ".."):
-            continue
-        name = parts[0]
-        # Accept zip files and directories (but not 'preview')
-        if name.endswith(".zip"):
-            entries.append(name)
-        elif "D" in line and name != "preview":
-            entries.append(name)
-
-    if entries:
-        # Return last entry (usually most recent)
-        return entries[-1]
-    return None
+    return latest
 
 
 if __name__ == "__main__":
@@ -6,48 +6,51 @@ Fails silently if OpenScan is unreachable.
 """
 import argparse
 import os
+import random
 import subprocess
 import sys
 import time
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-
+from discover import discover_openscan, lookup_openscan
+from envutil import load_env
+from scan_fetch import is_scan_entry, parse_smb_ls, smb_auth_args, smb_list_scans
 
-def load_env(env_path):
-    config = {}
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    return config
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_POLL_INTERVAL = 600  # seconds; cap for backoff while OpenScan is unreachable
 
 
 def get_scan_list(openscan_ip, smb_user, smb_pass):
-    """Get list of scan directories from OpenScan Samba share."""
-    try:
-        result = subprocess.run(
-            ["smbclient", f"//{openscan_ip}/PiShare",
-             "-U", f"{smb_user}%{smb_pass}",
-             "-c", "ls OpenScan/scans/*"],
-            capture_output=True, text=True, timeout=10
-        )
+    """Get the set of scans (zip files and directories) on the OpenScan Samba share."""
+    listing = smb_list_scans(openscan_ip, smb_user, smb_pass)
+    if listing is None:
+        try:
+            result = subprocess.run(
+                ["smbclient", f"//{openscan_ip}/PiShare",
+                 *smb_auth_args(smb_user, smb_pass),
+                 "-c", "ls OpenScan/scans/*"],
+                capture_output=True, text=True, timeout=10
+            )
+        except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
+            return None  # Silent fail
         if result.returncode != 0:
             return None  # Silent fail
+        listing = parse_smb_ls(result.stdout.splitlines())
+    # Same rule as get_latest_scan, whichever path produced the listing
+    return {name for name, is_dir in listing if is_scan_entry(name, is_dir)}
+
+
+def resolve_openscan(openscan_host):
+    """Resolve OpenScan's IP (cached, with mDNS fallback), else the hostname itself."""
+    return discover_openscan(openscan_host) or openscan_host
 
-        dirs = set()
-        for line in result.stdout.strip().split("\n"):
-            line = line.strip()
-            if line and "D" in line:
-                parts = line.split()
-                if parts and parts[0] not in (".", ".."):
-                    dirs.add(parts[0])
-        return dirs
-    except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
-        return None  # Silent fail
+
+def reresolve_openscan(openscan_host, current):
+    """Look OpenScan up again, skipping the cache; keeps current if not found."""
+    addr = lookup_openscan(openscan_host)
+    if addr and addr != current:
+        print(f"OpenScan address changed: {current} -> {addr}")
+        return addr
+    return current
 
 
 def notify(message):
@@ -77,13 +80,9 @@ def watch(env_path, poll_interval=60):
     smb_user = config.get("OPENSCAN_SMB_USER", "pi")
     smb_pass = config.get("OPENSCAN_SMB_PASS", "raspberry")
 
-    # Resolve hostname to IP
-    import socket
-    try:
-        ip_info = socket.getaddrinfo(openscan_host, None, socket.AF_INET)
-        openscan_ip = ip_info[0][4][0] if ip_info else openscan_host
-    except socket.gaierror:
-        openscan_ip = openscan_host
+    # Resolve once up front; re-resolved only after a failed poll, in case
+    # DHCP handed OpenScan a new address
+    openscan_ip = resolve_openscan(openscan_host)
 
     known_scans = set()
 
@@ -97,13 +96,22 @@ def watch(env_path, poll_interval=60):
 
     notify("Watcher started — monitoring for new scans")
 
+    cur_interval = poll_interval
+    fail_count = 0
     while True:
-        time.sleep(poll_interval)
+        time.sleep(cur_interval)
 
         current = get_scan_list(openscan_ip, smb_user, smb_pass)
         if current is None:
-            # OpenScan unreachable, fail silently
+            # OpenScan unreachable, fail silently but back off (with jitter)
+            fail_count += 1
+            # Never below the normal interval, even when --interval > MAX_POLL_INTERVAL
+            backoff = min(poll_interval * 2 ** fail_count, MAX_POLL_INTERVAL)
+            cur_interval = max(poll_interval, backoff * random.uniform(0.8, 1.2))
+            openscan_ip = reresolve_openscan(openscan_host, openscan_ip)
             continue
+        fail_count = 0
+        cur_interval = poll_interval
 
         new_scans = current - known_scans
         if new_scans:
@@ -3,6 +3,9 @@
 Discover Bambu Lab printer on the local network via SSDP and port scanning.
 Returns the printer's current IP address.
 """
+import errno
+import os
+import selectors
 import socket
 import ssl
 import struct
@@ -15,8 +18,22 @@ import subprocess
 SSDP_ADDR = "239.255.255.250"
 SSDP_PORT = 2021  # Bambu Lab uses port 2021 for SSDP, not standard 1900
 MQTT_PORT = 8883
-SUBNET_PREFIX = "192.168.1."
+DEFAULT_SUBNET_PREFIX = "192.168.1."
 SCAN_TIMEOUT = 2
+SYN_SCAN_WAIT = 0.5  # seconds to collect SYN-ACKs after the raw probes go out
+
+
+def _local_subnet():
+    """/24 prefix of the interface holding the default route (no packets sent)."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0].rsplit(".", 1)[0] + "."
+    except OSError:
+        return DEFAULT_SUBNET_PREFIX
+
+
+SUBNET_PREFIX = _local_subnet()
 
 
 def discover_ssdp(timeout=5):
@@ -50,20 +67,112 @@ def discover_ssdp(timeout=5):
     return None
 
 
+def _tcp_checksum(data):
+    """RFC 1071 ones'-complement checksum."""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _syn_scan(wait=SYN_SCAN_WAIT):
+    """Probe the subnet with raw SYNs and collect SYN-ACK replies (root only).
+
+    One packet out and one back per host, with no sockets or handshakes;
+    the kernel answers each SYN-ACK with a RST since no socket owns it.
+    """
+    # Source address the kernel would use to reach the subnet
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.connect((f"{SUBNET_PREFIX}1", 9))
+        src_ip = probe.getsockname()[0]
+    src = socket.inet_aton(src_ip)
+    sport = 40000 + os.getpid() % 20000
+    seq = int.from_bytes(os.urandom(4), "big")
+
+    found = []
+    with socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP) as sock:
+        for i in range(1, 255):
+            ip = f"{SUBNET_PREFIX}{i}"
+            # TCP header only; the kernel prepends the IP header
+            tcp = struct.pack("!HHIIBBHHH", sport, MQTT_PORT, seq, 0, 5 << 4, 0x02, 64240, 0, 0)
+            pseudo = src + socket.inet_aton(ip) + struct.pack("!BBH", 0, socket.IPPROTO_TCP, len(tcp))
+            tcp = tcp[:16] + struct.pack("!H", _tcp_checksum(pseudo + tcp)) + tcp[18:]
+            sock.sendto(tcp, (ip, 0))
+
+        deadline = time.monotonic() + wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                packet = sock.recv(65535)
+            except socket.timeout:
+                break
+            ihl = (packet[0] & 0x0F) * 4
+            if len(packet) < ihl + 14:
+                continue
+            src_port, dst_port, _, ack, _, flags = struct.unpack("!HHIIBB", packet[ihl:ihl + 14])
+            ip = socket.inet_ntoa(packet[12:16])
+            if (src_port == MQTT_PORT and dst_port == sport and flags & 0x12 == 0x12
+                    and ack == (seq + 1) & 0xFFFFFFFF and ip.startswith(SUBNET_PREFIX)
+                    and ip not in found):
+                found.append(ip)
+                print(f"  Port 8883 open: {ip}")
+    return found
+
+
+def _connect_scan(timeout=SCAN_TIMEOUT):
+    """Probe the subnet with concurrent non-blocking TCP connects."""
+    found = []
+
+    # Fire all 254 non-blocking connects at once and wait on them together,
+    # so the scan costs one timeout rather than one per host
+    sel = selectors.DefaultSelector()
+    try:
+        for i in range(1, 255):
+            ip = f"{SUBNET_PREFIX}{i}"
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            err = sock.connect_ex((ip, MQTT_PORT))
+            if err in (0, errno.EINPROGRESS):
+                sel.register(sock, selectors.EVENT_WRITE, ip)
+            else:
+                sock.close()
+
+        deadline = time.monotonic() + timeout
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(timeout=remaining):
+                sock = key.fileobj
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    found.append(key.data)
+                    print(f"  Port 8883 open: {key.data}")
+                sel.unregister(sock)
+                sock.close()
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+    return found
+
+
 def discover_port_scan(serial=None, timeout=SCAN_TIMEOUT):
     """Scan subnet for hosts with MQTT port 8883 open, verify via TLS cert."""
     print(f"Port scanning {SUBNET_PREFIX}0/24 for MQTT :8883 ...")
-    found = []
-
-    for i in range(1, 255):
-        ip = f"{SUBNET_PREFIX}{i}"
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.3)
-        result = sock.connect_ex((ip, MQTT_PORT))
-        sock.close()
-        if result == 0:
-            found.append(ip)
-            print(f"  Port 8883 open: {ip}")
+    found = None
+    if os.geteuid() == 0:
+        try:
+            found = _syn_scan()
+        except OSError as e:
+            print(f"  Raw SYN scan unavailable ({e}), using connect scan")
+    if found is None:
+        found = _connect_scan(timeout)
+    found.sort(key=lambda ip: int(ip.rsplit(".", 1)[1]))
 
     for ip in found:
         detected_serial = verify_bambu_tls(ip)
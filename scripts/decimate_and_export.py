@@ -9,6 +9,7 @@ import bpy
 import sys
 import os
 import argparse
+import struct
 
 
 def parse_args():
@@ -81,20 +82,56 @@ def decimate(obj, ratio=None, target_faces=None):
 
     print(f"Decimation ratio: {ratio}")
 
-    modifier = obj.modifiers.new(name="Decimate", type='DECIMATE')
-    modifier.ratio = ratio
-    modifier.use_collapse_triangulate = True
-
+    # Collapse-decimate the edit-mode BMesh in place rather than through a
+    # Decimate modifier, which evaluates into a second full Mesh copy first
     bpy.context.view_layer.objects.active = obj
-    bpy.ops.object.modifier_apply(modifier=modifier.name)
+    bpy.ops.object.mode_set(mode='EDIT')
+    bpy.ops.mesh.select_all(action='SELECT')
+    bpy.ops.mesh.quads_convert_to_tris()
+    bpy.ops.mesh.decimate(ratio=ratio)
+    bpy.ops.object.mode_set(mode='OBJECT')
 
     final_faces = len(obj.data.polygons)
     print(f"Final face count: {final_faces} (reduced by {100 * (1 - final_faces / original_faces):.1f}%)")
 
 
-def export_stl(filepath):
+# Binary STL triangle record: normal, three vertices, attribute byte count
+STL_RECORD = [("normal", "<f4", (3,)), ("verts", "<f4", (3, 3)), ("attr", "<u2")]
+
+
+def export_stl(obj, filepath):
+    """Write obj as binary STL in world space, straight from the mesh arrays.
+
+    foreach_get + numpy replaces the export add-on's per-triangle Python loop.
+    """
+    import numpy as np
+
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    bpy.ops.export_mesh.stl(filepath=filepath, use_selection=True)
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    ntris = len(mesh.loop_triangles)
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    matrix = np.array(obj.matrix_world, dtype=np.float32)
+    co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+
+    tris = np.empty(ntris * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    tri_co = co[tris.reshape(-1, 3)]
+
+    normals = np.cross(tri_co[:, 1] - tri_co[:, 0], tri_co[:, 2] - tri_co[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+    records = np.zeros(ntris, dtype=STL_RECORD)
+    records["normal"] = normals
+    records["verts"] = tri_co
+    with open(filepath, "wb") as f:
+        f.write(b"\0" * 80)
+        f.write(struct.pack("<I", ntris))
+        f.write(records.tobytes())
+
     size_mb = os.path.getsize(filepath) / (1024 * 1024)
     print(f"Exported STL: {filepath} ({size_mb:.1f} MB)")
 
@@ -114,7 +151,7 @@ def main():
     bpy.context.view_layer.objects.active = obj
 
     decimate(obj, ratio=args.ratio, target_faces=args.nfaces)
-    export_stl(args.outm)
+    export_stl(obj, args.outm)
 
     print("Done.")
 
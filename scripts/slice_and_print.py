@@ -11,32 +11,95 @@ import argparse
 import ftplib
 import glob
 import json
+import mmap
 import os
 import re
+import socket
 import ssl
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    import paho.mqtt.client as mqtt
+try:  # optional: faster parsing of printer reports
+    import orjson
 except ImportError:
-    print("ERROR: paho-mqtt not installed. Run: pip3 install paho-mqtt", file=sys.stderr)
-    sys.exit(1)
+    orjson = None
+
+
+# Same KEY=value grammar as pipeline/envutil.py (scripts/ runs standalone)
+_ENV_RE = re.compile(r"^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.M)
 
 
 def load_env(env_path):
     """Load .env file into a dict."""
-    config = {}
     with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                key, val = line.split("=", 1)
-                config[key.strip()] = val.strip()
-    return config
+        return dict(_ENV_RE.findall(f.read()))
+
+
+PRINTER_CACHE_FILE = os.path.expanduser("~/.cache/bambu_ip.json")
+PRINTER_CACHE_TTL = 7 * 24 * 3600  # seconds
+PRINTER_PROBE_TIMEOUT = 0.3  # seconds; the printer is on the LAN
+
+
+def cached_printer_ip(serial):
+    """Return the cached IP for serial if it is fresh and :8883 still answers."""
+    try:
+        with open(PRINTER_CACHE_FILE) as f:
+            entry = json.load(f)[serial]
+        if time.time() - entry["ts"] > PRINTER_CACHE_TTL:
+            return None
+        ip = entry["ip"]
+        with socket.create_connection((ip, 8883), timeout=PRINTER_PROBE_TIMEOUT):
+            return ip
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _update_cache(path, serial, entry):
+    """Store entry under serial in a JSON cache file (best effort, atomic)."""
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[serial] = dict(entry, ts=time.time())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def cache_printer_ip(serial, ip):
+    """Remember serial → ip for later runs (best effort)."""
+    _update_cache(PRINTER_CACHE_FILE, serial, {"ip": ip})
+
+
+SIG_CACHE_FILE = os.path.expanduser("~/.cache/bambu_sig.json")
+SIG_CACHE_TTL = 24 * 3600  # seconds; only changes with a firmware update
+
+
+def cached_signing_required(serial, ip):
+    """Last probe's answer for this printer if fresh, else None."""
+    try:
+        with open(SIG_CACHE_FILE) as f:
+            entry = json.load(f)[serial]
+        if entry["ip"] != ip or time.time() - entry["ts"] > SIG_CACHE_TTL:
+            return None
+        return bool(entry["required"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def cache_signing_required(serial, ip, required):
+    _update_cache(SIG_CACHE_FILE, serial, {"ip": ip, "required": required})
 
 
 def discover_printer(serial):
@@ -55,6 +118,9 @@ def discover_printer(serial):
     return None
 
 
+SLICER_TAIL_BYTES = 1000  # slicer log bytes shown on failure
+
+
 def slice_stl(stl_path, output_3mf, slicer_profile=None, filament=None):
     """Slice STL to 3MF using OrcaSlicer CLI.
 
@@ -72,22 +138,35 @@ def slice_stl(stl_path, output_3mf, slicer_profile=None, filament=None):
     cmd.extend([stl_path, "--export-3mf", output_3mf])
 
     print(f"Slicing: {os.path.basename(stl_path)} → {os.path.basename(output_3mf)}")
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-    if result.returncode != 0:
-        print(f"Slicer stdout: {result.stdout[-500:]}", file=sys.stderr)
-        print(f"Slicer stderr: {result.stderr[-500:]}", file=sys.stderr)
-        raise RuntimeError(f"OrcaSlicer failed with exit code {result.returncode}")
+    # --debug 5 logs heavily: let the kernel write it straight to a temp file
+    # (no Python pipe reading) and only read back the tail on failure
+    with tempfile.TemporaryFile() as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            proc.wait(timeout=300)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        if proc.returncode != 0:
+            size = log.seek(0, os.SEEK_END)
+            log.seek(max(0, size - SLICER_TAIL_BYTES))
+            tail = log.read().decode(errors="replace")
+            print(f"Slicer output (tail): {tail}", file=sys.stderr)
+            raise RuntimeError(f"OrcaSlicer failed with exit code {proc.returncode}")
     if not os.path.exists(output_3mf):
         raise RuntimeError("OrcaSlicer exited 0 but 3MF was not created")
     print(f"Sliced: {output_3mf} ({os.path.getsize(output_3mf) / 1e6:.1f} MB)")
     return output_3mf
 
 
+FTPS_BLOCKSIZE = 1 << 20  # bytes per data-connection send (ftplib default is 8 KiB)
+
+
 class ImplicitFTPS(ftplib.FTP_TLS):
     """FTP_TLS subclass for Bambu implicit FTPS (SSL from first byte, port 990).
     Also handles TLS session reuse required by Bambu's vsFTPd."""
     def connect(self, host='', port=0, timeout=-999, source_address=None):
-        import socket
         if host != '':
             self.host = host
         if port > 0:
@@ -96,6 +175,7 @@ class ImplicitFTPS(ftplib.FTP_TLS):
             self.timeout = timeout
         self.sock = socket.create_connection(
             (self.host, self.port), self.timeout, source_address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.af = self.sock.family
         self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host)
         self.file = self.sock.makefile('r', encoding=self.encoding)
@@ -105,6 +185,7 @@ class ImplicitFTPS(ftplib.FTP_TLS):
     def ntransfercmd(self, cmd, rest=None):
         # Reuse TLS session from control connection for data connection
         conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         if self._prot_p:
             conn = self.context.wrap_socket(
                 conn, server_hostname=self.host,
@@ -112,11 +193,8 @@ class ImplicitFTPS(ftplib.FTP_TLS):
         return conn, size
 
 
-def upload_ftps(printer_ip, access_code, filepath):
-    """Upload 3MF to printer via implicit FTPS (port 990)."""
-    filename = os.path.basename(filepath)
-    print(f"Uploading {filename} to {printer_ip}:990 via FTPS...")
-
+def open_ftps(printer_ip, access_code):
+    """Open an implicit FTPS (port 990) session on the printer."""
     ctx = ssl.create_default_context()
     ctx.check_hostname = False
     ctx.verify_mode = ssl.CERT_NONE
@@ -125,8 +203,10 @@ def upload_ftps(printer_ip, access_code, filepath):
     ftp.connect(printer_ip, 990, timeout=30)
     ftp.login("bblp", access_code)
     ftp.prot_p()
+    return ftp
+
 
-    # Bambu printers require uploads to /cache/ or /model/
+def _enter_cache_dir(ftp):
     try:
         ftp.cwd("/cache")
     except ftplib.error_perm:
@@ -136,10 +216,70 @@ def upload_ftps(printer_ip, access_code, filepath):
         except ftplib.error_perm:
             pass  # May already be there or not needed
 
-    with open(filepath, "rb") as f:
-        ftp.storbinary(f"STOR {filename}", f)
 
-    ftp.quit()
+def _stor_mapped(ftp, cmd, filepath):
+    """storbinary() that sends slices of an mmap instead of read() copies."""
+    ftp.voidcmd("TYPE I")
+    with open(filepath, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            ftp.transfercmd(cmd) as conn:
+        view = memoryview(mm)
+        try:
+            for offset in range(0, len(view), FTPS_BLOCKSIZE):
+                conn.sendall(view[offset:offset + FTPS_BLOCKSIZE])
+        finally:
+            view.release()
+        if isinstance(conn, ssl.SSLSocket):
+            conn.unwrap()
+    return ftp.voidresp()
+
+
+def _quit_ftps(ftp):
+    try:
+        ftp.quit()
+    except (OSError, EOFError, ftplib.Error):
+        ftp.close()
+
+
+def upload_ftps(printer_ip, access_code, filepath, ftp=None):
+    """Upload 3MF to printer via implicit FTPS (port 990).
+
+    ftp, if given, is a session from open_ftps(); it is replaced by a fresh
+    one if the printer has dropped it in the meantime.
+    """
+    filename = os.path.basename(filepath)
+    print(f"Uploading {filename} to {printer_ip}:990 via FTPS...")
+
+    if ftp is not None:
+        try:
+            ftp.voidcmd("NOOP")
+        except (OSError, EOFError, ftplib.Error):
+            print("Pre-opened FTPS session was dropped, reconnecting...")
+            ftp = None
+    if ftp is None:
+        ftp = open_ftps(printer_ip, access_code)
+
+    def stor(target):
+        if os.path.getsize(filepath):
+            _stor_mapped(ftp, f"STOR {target}", filepath)
+        else:  # an empty file cannot be mapped
+            with open(filepath, "rb") as f:
+                ftp.storbinary(f"STOR {target}", f, blocksize=FTPS_BLOCKSIZE)
+
+    # Bambu printers require uploads to /cache/ or /model/. An absolute
+    # path saves the CWD round trips; only if it is refused (no /cache yet)
+    # is the directory entered/created first.
+    try:
+        stor(f"/cache/{filename}")
+    except ftplib.error_perm as e:
+        if not str(e).startswith("550"):
+            raise
+        _enter_cache_dir(ftp)
+        stor(filename)
+
+    # The upload is already confirmed (226); say goodbye in the background
+    # while the print is triggered
+    threading.Thread(target=_quit_ftps, args=(ftp,), daemon=True).start()
     print(f"Upload complete: {filename}")
     return filename
 
@@ -159,137 +299,291 @@ def find_bambu_studio(studio_dir):
 
 
 MQTT_SIGNATURE_REQUIRED = 0x20000000
+MQTT_PORT = 8883
+MQTT_KEEPALIVE = 60  # seconds; the prewarmed connection must outlive slicing
+
+# MQTT 3.1.1 control packet types (high nibble of the fixed header)
+MQTT_CONNECT, MQTT_CONNACK, MQTT_PUBLISH, MQTT_SUBSCRIBE = 0x10, 0x20, 0x30, 0x82
+MQTT_PINGRESP = 0xD0
+
+# One context for every MQTT connection so a reconnect in the same run can
+# resume the TLS session instead of doing a full handshake
+_MQTT_CTX = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+_MQTT_CTX.check_hostname = False
+_MQTT_CTX.verify_mode = ssl.CERT_NONE
+_mqtt_tls_sessions = {}
+
+# Request payloads are constant apart from the file name, so they are
+# serialized once; per print only the name is spliced into the bytes
+_PUSHALL = json.dumps({"pushing": {"sequence_id": "0", "command": "pushall"}}).encode()
+_PRINT_TMPL = json.dumps({
+    "print": {
+        "sequence_id": 0,
+        "command": "project_file",
+        "param": "Metadata/plate_1.gcode",
+        "project_id": "0",
+        "profile_id": "0",
+        "task_id": "0",
+        "subtask_id": "0",
+        "subtask_name": "__SUBTASK__",
+        "file": "",
+        "url": "file:///sdcard/cache/__FILE__",
+        "timelapse": False,
+        "bed_type": "auto",
+        "bed_leveling": True,
+        "flow_cali": True,
+        "vibration_cali": True,
+        "layer_inspect": True,
+        "ams_mapping": [0],
+        "use_ams": False
+    }
+}).encode()
+# Fixed segments around the placeholders, so a file name that happens to
+# contain a placeholder is never substituted twice
+_PRINT_HEAD, _PRINT_MID, _PRINT_TAIL = re.split(rb"__SUBTASK__|__FILE__", _PRINT_TMPL)
+_json_loads = orjson.loads if orjson else json.loads
+
+
+def _print_payload(filename):
+    """project_file request for filename, built from the _PRINT_TMPL segments."""
+    def esc(value):
+        return json.dumps(value)[1:-1].encode()  # JSON string body, no quotes
+    return b"".join((_PRINT_HEAD, esc(filename.replace(".3mf", "")),
+                     _PRINT_MID, esc(filename), _PRINT_TAIL))
+
+
+def _mqtt_str(value):
+    data = value.encode() if isinstance(value, str) else value
+    return struct.pack("!H", len(data)) + data
+
+
+def _mqtt_packet(header, body):
+    """Fixed header byte + variable-length 'remaining length' + body."""
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes([header]) + bytes(encoded) + body
 
 
-def check_mqtt_signature_required(printer_ip, serial, access_code):
-    """Check if printer firmware requires MQTT message signing."""
-    import uuid
-    result = {"required": None}
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("MQTT connection closed by printer")
+        buf += chunk
+    return bytes(buf)
 
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            client.subscribe(f"device/{serial}/report")
-            client.publish(f"device/{serial}/request",
-                           json.dumps({"pushing": {"sequence_id": "0", "command": "pushall"}}))
 
-    def on_message(client, userdata, msg):
+def _mqtt_read(sock, timeout):
+    """Read one packet as (type, flags, body); None if nothing arrives in time.
+
+    Only the wait for a packet's first byte is bounded by timeout, so a
+    timeout never leaves the stream mid-packet.
+    """
+    sock.settimeout(max(timeout, 0.01))
+    try:
+        first = _recv_exact(sock, 1)[0]
+    except socket.timeout:
+        return None
+    sock.settimeout(10)
+    length, shift = 0, 0
+    while True:
+        byte = _recv_exact(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    return first & 0xF0, first & 0x0F, _recv_exact(sock, length)
+
+
+def _mqtt_publish(conn, payload):
+    topic = f"device/{conn['serial']}/request"
+    conn["sock"].sendall(_mqtt_packet(MQTT_PUBLISH, _mqtt_str(topic) + payload))
+
+
+def _mqtt_reports(conn, timeout):
+    """Yield the "print" section of each report received until timeout elapses."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        packet = _mqtt_read(conn["sock"], remaining)
+        if packet is None:
+            return
+        ptype, flags, body = packet
+        if ptype != MQTT_PUBLISH:
+            continue  # SUBACK, PINGRESP
+        topic_len = struct.unpack("!H", body[:2])[0]
+        offset = 2 + topic_len + (2 if flags & 0x06 else 0)  # packet id if QoS > 0
         try:
-            data = json.loads(msg.payload)
-            if "print" in data and "fun" in data["print"]:
-                fun_int = int(data["print"]["fun"], 16)
-                result["required"] = bool(fun_int & MQTT_SIGNATURE_REQUIRED)
-        except (json.JSONDecodeError, KeyError, ValueError):
-            pass
+            data = _json_loads(body[offset:])
+        except ValueError:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("print"), dict):
+            yield data["print"]
 
-    client = mqtt.Client(client_id=f"probe-{uuid.uuid4()}",
-                         protocol=mqtt.MQTTv311, clean_session=True)
-    client.username_pw_set("bblp", access_code)
-    client.tls_set(cert_reqs=ssl.CERT_NONE)
-    client.tls_insecure_set(True)
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(printer_ip, 8883, 60)
 
-    deadline = time.time() + 5
-    while time.time() < deadline and result["required"] is None:
-        client.loop(timeout=0.5)
-    client.disconnect()
-    return result["required"] or False
+def connect_printer_mqtt(printer_ip, serial, access_code, probe=True):
+    """Connect to the printer's MQTT broker and start the signing probe.
+
+    Speaks the few MQTT 3.1.1 packets needed (CONNECT, SUBSCRIBE, QoS 0
+    PUBLISH) directly on one TLS socket. With probe, a pushall is requested
+    on connect; its report tells whether firmware requires MQTT signing
+    (01.11+). Returns a handle for trigger_print().
+    """
+    print(f"Connecting MQTT to {printer_ip}:{MQTT_PORT}...")
+    raw = socket.create_connection((printer_ip, MQTT_PORT), timeout=10)
+    raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock = _MQTT_CTX.wrap_socket(raw, server_hostname=printer_ip,
+                                 session=_mqtt_tls_sessions.get(printer_ip))
+
+    # Protocol "MQTT" level 4; flags: username, password, persistent session.
+    # A stable client id lets the broker keep our subscription between runs.
+    body = (_mqtt_str("MQTT") + bytes([4, 0xC0]) + struct.pack("!H", MQTT_KEEPALIVE)
+            + _mqtt_str(f"printline-{serial}") + _mqtt_str("bblp") + _mqtt_str(access_code))
+    sock.sendall(_mqtt_packet(MQTT_CONNECT, body))
+    packet = _mqtt_read(sock, 10)
+    if packet is None or packet[0] != MQTT_CONNACK or len(packet[2]) < 2 or packet[2][1] != 0:
+        rc = packet[2][1] if packet and packet[0] == MQTT_CONNACK else None
+        sock.close()
+        raise RuntimeError(f"MQTT connection failed: rc={rc}")
+    if sock.session is not None:  # ticket has arrived by the time of CONNACK
+        _mqtt_tls_sessions[printer_ip] = sock.session
+    session_present = packet[2][0] & 0x01
+    print("MQTT connected" + (" (session resumed)" if session_present else ""))
+
+    conn = {"sock": sock, "serial": serial, "printer_ip": printer_ip, "access_code": access_code}
+    if not session_present:
+        sock.sendall(_mqtt_packet(MQTT_SUBSCRIBE, struct.pack("!H", 1)
+                                  + _mqtt_str(f"device/{serial}/report") + b"\x00"))
+    if probe:
+        _mqtt_publish(conn, _PUSHALL)
+    return conn
+
+
+def _signing_required(conn, timeout=5):
+    """Wait for the pushall report's 'fun' flags; None if none arrive."""
+    for p in _mqtt_reports(conn, timeout):
+        if "fun" in p:
+            try:
+                return bool(int(p["fun"], 16) & MQTT_SIGNATURE_REQUIRED)
+            except (TypeError, ValueError):
+                pass
+    return None
 
 
-def trigger_print(printer_ip, serial, access_code, filename):
+def _mqtt_alive(conn, timeout=5):
+    """PINGREQ round trip; False if the connection has gone away."""
+    try:
+        conn["sock"].sendall(b"\xc0\x00")
+        while True:
+            packet = _mqtt_read(conn["sock"], timeout)
+            if packet is None:
+                return False
+            if packet[0] == MQTT_PINGRESP:
+                return True
+    except OSError:
+        return False
+
+
+def upload_only_result(filename):
+    """Status for firmware that rejects unsigned print commands."""
+    print("NOTE: Firmware requires MQTT message signing (01.11+).")
+    print(f"File '{filename}' uploaded to printer SD card (/cache/).")
+    return {"status": "UPLOADED", "percent": 0, "remaining": 0,
+            "note": "MQTT signing required; opening Bambu Studio"}
+
+
+def trigger_print(conn, filename, signing_required=None):
     """Send MQTT command to start printing the uploaded file.
 
-    If firmware requires MQTT signing (01.11+), returns upload-only status
-    so the user can start the print from the touchscreen.
+    conn comes from connect_printer_mqtt() and may have sat idle while
+    slicing; if the printer dropped it, a new one is opened. Unless
+    signing_required is already known (cached), the probe's answer is
+    awaited and cached; if the printer never reports it, the print is tried
+    unsigned and nothing is cached. If firmware requires MQTT signing
+    (01.11+), returns upload-only status so the user can start the print
+    from the touchscreen.
     """
-    # Check if firmware blocks unsigned MQTT commands
-    if check_mqtt_signature_required(printer_ip, serial, access_code):
-        print("NOTE: Firmware requires MQTT message signing (01.11+).")
-        print(f"File '{filename}' uploaded to printer SD card (/cache/).")
-        return {"status": "UPLOADED", "percent": 0, "remaining": 0,
-                "note": "MQTT signing required; opening Bambu Studio"}
-
-    topic_request = f"device/{serial}/request"
-    topic_report = f"device/{serial}/report"
-
-    print_cmd = {
-        "print": {
-            "sequence_id": 0,
-            "command": "project_file",
-            "param": "Metadata/plate_1.gcode",
-            "project_id": "0",
-            "profile_id": "0",
-            "task_id": "0",
-            "subtask_id": "0",
-            "subtask_name": filename.replace(".3mf", ""),
-            "file": "",
-            "url": f"file:///sdcard/cache/{filename}",
-            "timelapse": False,
-            "bed_type": "auto",
-            "bed_leveling": True,
-            "flow_cali": True,
-            "vibration_cali": True,
-            "layer_inspect": True,
-            "ams_mapping": [0],
-            "use_ams": False
-        }
-    }
+    if signing_required is None:
+        # Check if firmware blocks unsigned MQTT commands
+        try:
+            signing_required = _signing_required(conn)
+        except (OSError, ConnectionError):
+            conn["sock"].close()
+            conn = connect_printer_mqtt(conn["printer_ip"], conn["serial"], conn["access_code"])
+            signing_required = _signing_required(conn)
+        if signing_required is None:
+            print("WARNING: Printer did not report MQTT signing support, trying unsigned",
+                  file=sys.stderr)
+        else:
+            cache_signing_required(conn["serial"], conn["printer_ip"], signing_required)
 
-    result = {"status": None, "percent": 0, "remaining": 0}
+    # A pushall reply buffered before the printer dropped the idle
+    # connection can satisfy the probe, so check liveness either way
+    if not signing_required and not _mqtt_alive(conn):
+        print("MQTT connection was dropped while slicing, reconnecting...")
+        conn["sock"].close()
+        conn = connect_printer_mqtt(conn["printer_ip"], conn["serial"], conn["access_code"],
+                                    probe=False)
 
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            print("MQTT connected")
-            client.subscribe(topic_report)
-            payload = json.dumps(print_cmd)
-            print(f"Sending print command to {topic_request}")
-            client.publish(topic_request, payload)
-        else:
-            print(f"MQTT connection failed: rc={rc}", file=sys.stderr)
+    try:
+        if signing_required:
+            return upload_only_result(filename)
 
-    def on_message(client, userdata, msg):
+        print(f"Sending print command to device/{conn['serial']}/request")
+        payload = _print_payload(filename)
+        try:
+            _mqtt_publish(conn, payload)
+        except OSError as e:
+            print(f"MQTT publish failed ({e}), reconnecting...")
+            conn["sock"].close()
+            conn = connect_printer_mqtt(conn["printer_ip"], conn["serial"], conn["access_code"],
+                                        probe=False)
+            _mqtt_publish(conn, payload)
+
+        result = {"status": None, "percent": 0, "remaining": 0}
+        timeout = 30
         try:
-            data = json.loads(msg.payload)
-            if "print" in data:
-                p = data["print"]
+            for p in _mqtt_reports(conn, timeout):
                 state = p.get("gcode_state", "")
-                percent = p.get("mc_percent", 0)
-                remaining = p.get("mc_remaining_time", 0)
                 if state:
                     result["status"] = state
-                    result["percent"] = percent
-                    result["remaining"] = remaining
-        except (json.JSONDecodeError, KeyError):
+                    result["percent"] = p.get("mc_percent", 0)
+                    result["remaining"] = p.get("mc_remaining_time", 0)
+                    if state in ("RUNNING", "PREPARE"):
+                        print(f"Print started! Status: {state}")
+                        break
+            else:
+                if result["status"]:
+                    print(f"Print status after {timeout}s: {result['status']}")
+                else:
+                    print("WARNING: No status received, print may not have started", file=sys.stderr)
+        except OSError as e:
+            # The command may or may not have gone through; don't resend it
+            print(f"WARNING: MQTT connection lost waiting for status ({e})", file=sys.stderr)
+        return result
+    finally:
+        try:
+            conn["sock"].sendall(b"\xe0\x00")  # DISCONNECT
+        except OSError:
             pass
+        conn["sock"].close()
 
-    client = mqtt.Client()
-    client.username_pw_set("bblp", access_code)
-    client.tls_set(cert_reqs=ssl.CERT_NONE)
-    client.tls_insecure_set(True)
-    client.on_connect = on_connect
-    client.on_message = on_message
-
-    print(f"Connecting MQTT to {printer_ip}:8883...")
-    client.connect(printer_ip, 8883, 60)
-    client.loop_start()
-
-    timeout = 30
-    start = time.time()
-    while time.time() - start < timeout:
-        if result["status"] in ("RUNNING", "PREPARE"):
-            print(f"Print started! Status: {result['status']}")
-            break
-        time.sleep(1)
-    else:
-        if result["status"]:
-            print(f"Print status after {timeout}s: {result['status']}")
-        else:
-            print("WARNING: No status received, print may not have started", file=sys.stderr)
 
-    client.loop_stop()
-    client.disconnect()
-    return result
+def _prewarmed(future, what):
+    """Result of a background connect, or None (with a note) if it failed."""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Pre-opening {what} failed ({e}), retrying...")
+        return None
 
 
 def main():
@@ -311,12 +605,30 @@ def main():
 
     # Discover printer
     printer_ip = args.printer_ip
+    if not printer_ip:
+        printer_ip = cached_printer_ip(serial)
+        if printer_ip:
+            print(f"Using cached printer IP: {printer_ip}")
     if not printer_ip:
         printer_ip = discover_printer(serial)
         if not printer_ip:
             print("ERROR: Could not discover printer", file=sys.stderr)
             sys.exit(1)
 
+    # A cached "signing required" means MQTT would only be used to find
+    # that out again, so no connection is opened at all
+    signing_required = cached_signing_required(serial, printer_ip)
+
+    # Open the FTPS session and MQTT connection (with its signing probe,
+    # unless cached) while the slicer runs
+    prewarm = ThreadPoolExecutor(max_workers=2)
+    ftp_future = prewarm.submit(open_ftps, printer_ip, access_code)
+    mqtt_future = None
+    if not signing_required:
+        mqtt_future = prewarm.submit(connect_printer_mqtt, printer_ip, serial, access_code,
+                                     probe=signing_required is None)
+    prewarm.shutdown(wait=False)
+
     # Slice if needed
     if args.stl:
         output_dir = os.path.dirname(args.stl) or "."
@@ -330,10 +642,17 @@ def main():
         process_json = os.path.join(profiles, "x1c_process.json")
         filament_json = os.path.join(profiles, "x1c_filament.json")
 
+        # One directory read instead of a stat() per profile
+        try:
+            with os.scandir(profiles) as it:
+                present = {e.name for e in it if e.is_file()}
+        except OSError:
+            present = set()
+
         slicer_profile = None
-        if os.path.isfile(machine_json) and os.path.isfile(process_json):
+        if {"x1c_machine.json", "x1c_process.json"} <= present:
             slicer_profile = f"{machine_json};{process_json}"
-        filament_path = filament_json if os.path.isfile(filament_json) else None
+        filament_path = filament_json if "x1c_filament.json" in present else None
 
         slice_stl(
             args.stl, threemf_path,
@@ -348,8 +667,17 @@ def main():
         sys.exit(1)
 
     # Upload and print
-    filename = upload_ftps(printer_ip, access_code, threemf_path)
-    result = trigger_print(printer_ip, serial, access_code, filename)
+    ftp = _prewarmed(ftp_future, "FTPS session")
+    filename = upload_ftps(printer_ip, access_code, threemf_path, ftp=ftp)
+    cache_printer_ip(serial, printer_ip)
+    if signing_required:
+        result = upload_only_result(filename)
+    else:
+        conn = _prewarmed(mqtt_future, "MQTT connection")
+        if conn is None:
+            conn = connect_printer_mqtt(printer_ip, serial, access_code,
+                                        probe=signing_required is None)
+        result = trigger_print(conn, filename, signing_required)
 
     if result.get("status") == "UPLOADED":
         bambu = find_bambu_studio(config.get("BAMBU_STUDIO_DIR", ""))
@@ -359,14 +687,21 @@ def main():
         else:
             print("Bambu Studio AppImage not found. Open manually: " + threemf_path)
 
-    # Output result for pipeline consumption
-    print(json.dumps({
+    # Output result for pipeline consumption, as bytes straight to stdout
+    status = {
         "printer_ip": printer_ip,
         "file": filename,
         "status": result.get("status"),
         "percent": result.get("percent", 0),
         "remaining_minutes": result.get("remaining", 0)
-    }))
+    }
+    if orjson:
+        line = orjson.dumps(status, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        line = json.dumps(status).encode() + b"\n"
+    sys.stdout.flush()  # keep it after everything already printed
+    sys.stdout.buffer.write(line)
+    sys.stdout.buffer.flush()
 
 
 if __name__ == "__main__":